@@ -0,0 +1,310 @@
+import os, sys, json, time, random, argparse, tempfile, threading, collections, statistics
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional, Dict, Any, List, Tuple
+
+import requests
+import rlp
+from eth_utils import keccak
+from eth_abi import encode as abi_encode, decode as abi_decode
+from eth_account import Account
+
+MOCK_CHAIN_ID = int(os.getenv("CHAIN_ID","688688"))
+MOCK_GAS_USED = 54_321
+
+def sel(sig: str) -> bytes:
+    return keccak(text=sig)[:4]
+
+SEL = {k: sel(v) for k, v in {
+    "allowance": "allowance(address,address)", "approve": "approve(address,uint256)", "balanceOf": "balanceOf(address)",
+    "decimals": "decimals()", "symbol": "symbol()", "minCommitmentAge": "minCommitmentAge()", "rentPrice": "rentPrice(string,uint256)",
+    "makeCommitment": "makeCommitment(string,address,uint256,bytes32,address,bytes[],bool,uint16)",
+    "aggregate3": "aggregate3((address,bool,bytes)[])"}.items()}
+
+class MockChain:
+    def __init__(self, block_time: float = 1.0, revert_selectors: Tuple[bytes,...] = ()):
+        self.lock = threading.Lock()
+        self.block_time = block_time
+        self.t0 = time.time()
+        self.nonces: collections.Counter = collections.Counter()
+        self.allow: Dict[Tuple[str,str,str],int] = {}
+        self.txs: Dict[str,Dict[str,Any]] = {}
+        self.counts: collections.Counter = collections.Counter()
+        self.revert = set(revert_selectors)
+
+    def head(self) -> int:
+        return int((time.time() - self.t0) / self.block_time) + 1 if self.block_time > 0 else 1
+
+    def call(self, to: str, data: bytes) -> bytes:
+        to = to.lower(); sl, args = data[:4], data[4:]
+        if sl in self.revert: raise ValueError("execution reverted")
+        if sl == SEL["aggregate3"]:
+            (calls,) = abi_decode(["(address,bool,bytes)[]"], args); out = []
+            for t, _, d in calls:
+                try: out.append((True, self.call(t, d)))
+                except Exception: out.append((False, b""))
+            return abi_encode(["(bool,bytes)[]"], [out])
+        if sl == SEL["allowance"]:
+            o, sp = abi_decode(["address","address"], args); return abi_encode(["uint256"], [self.allow.get((o.lower(), to, sp.lower()), 0)])
+        if sl == SEL["balanceOf"]: return abi_encode(["uint256"], [10**24])
+        if sl == SEL["decimals"]: return abi_encode(["uint8"], [18])
+        if sl == SEL["symbol"]: return abi_encode(["string"], ["MOCK"])
+        if sl == SEL["minCommitmentAge"]: return abi_encode(["uint256"], [0])
+        if sl == SEL["rentPrice"]: return abi_encode(["(uint256,uint256)"], [(10**15, 0)])
+        if sl == SEL["makeCommitment"]: return keccak(data)
+        raise ValueError("execution reverted")
+
+    def block(self, n: int) -> Dict[str,Any]:
+        z32 = "0x" + "00"*32
+        return {"number": hex(n), "hash": "0x" + keccak(n.to_bytes(8,"big")).hex(), "parentHash": z32, "baseFeePerGas": hex(10**9),
+                "timestamp": hex(int(time.time())), "gasLimit": hex(30_000_000), "gasUsed": "0x0", "transactions": [], "miner": "0x" + "00"*20,
+                "extraData": "0x", "difficulty": "0x0", "nonce": "0x0000000000000000", "sha3Uncles": z32, "logsBloom": "0x" + "00"*256,
+                "transactionsRoot": z32, "stateRoot": z32, "receiptsRoot": z32, "size": "0x0", "totalDifficulty": "0x0", "uncles": []}
+
+    def send(self, raw_hex: str) -> str:
+        raw = bytes.fromhex(raw_hex[2:]); h = "0x" + keccak(raw).hex()
+        sender = Account.recover_transaction(raw).lower()
+        if raw[0] < 0x7f:
+            f = rlp.decode(raw[1:]); nonce, to, data = int.from_bytes(f[1],"big"), f[5], f[7]
+        else:
+            f = rlp.decode(raw); nonce, to, data = int.from_bytes(f[0],"big"), f[3], f[5]
+        to = "0x" + bytes(to).hex(); data = bytes(data)
+        with self.lock:
+            if nonce < self.nonces[sender]: raise ValueError("nonce too low")
+            self.nonces[sender] = max(self.nonces[sender], nonce + 1)
+            if data[:4] == SEL["approve"]:
+                sp, amt = abi_decode(["address","uint256"], data[4:]); self.allow[(sender, to.lower(), sp.lower())] = amt
+            self.txs[h] = {"sent": time.time(), "from": sender, "to": to, "nonce": nonce, "status": 0 if data[:4] in self.revert else 1}
+        return h
+
+    def receipt(self, h: str) -> Optional[Dict[str,Any]]:
+        t = self.txs.get(h)
+        if not t or time.time() - t["sent"] < self.block_time:
+            return None
+        return {"transactionHash": h, "status": hex(t["status"]), "blockNumber": hex(self.head()), "blockHash": "0x" + "11"*32,
+                "gasUsed": hex(MOCK_GAS_USED), "cumulativeGasUsed": hex(MOCK_GAS_USED), "effectiveGasPrice": hex(10**9), "from": t["from"], "to": t["to"],
+                "logs": [], "logsBloom": "0x" + "00"*256, "contractAddress": None, "transactionIndex": "0x0", "type": "0x2"}
+
+    def dispatch(self, m: str, p: list) -> Any:
+        if m == "eth_chainId": return hex(MOCK_CHAIN_ID)
+        if m == "net_version": return str(MOCK_CHAIN_ID)
+        if m == "web3_clientVersion": return "pharos-mock/1.0"
+        if m == "eth_blockNumber": return hex(self.head())
+        if m in ("eth_gasPrice", "eth_maxPriorityFeePerGas"): return hex(10**9)
+        if m == "eth_getBalance": return hex(10**21)
+        if m == "eth_getCode": return "0x60"
+        if m == "eth_getBlockByNumber": return self.block(self.head() if p[0] in ("latest","pending","safe","finalized") else int(p[0], 16))
+        if m == "eth_getTransactionCount":
+            with self.lock: return hex(self.nonces[p[0].lower()])
+        if m == "eth_estimateGas": return hex(100_000)
+        if m == "eth_call": return "0x" + self.call(p[0]["to"], bytes.fromhex((p[0].get("data") or p[0].get("input") or "0x")[2:])).hex()
+        if m == "eth_sendRawTransaction": return self.send(p[0])
+        if m == "eth_getTransactionReceipt": return self.receipt(p[0])
+        if m == "eth_getTransactionByHash":
+            t = self.txs.get(p[0])
+            return None if not t else {"hash": p[0], "nonce": hex(t["nonce"]), "from": t["from"], "to": t["to"], "blockNumber": None}
+        raise ValueError(f"method not supported: {m}")
+
+class Recorder:
+    def __init__(self, path: str):
+        self.lock = threading.Lock(); self.f = open(path, "a")
+
+    def write(self, req: Dict[str,Any], resp: Dict[str,Any], secs: float):
+        line = json.dumps({"method": req.get("method"), "params": req.get("params") or [], "result": resp.get("result"), "error": resp.get("error"), "secs": round(secs, 6)})
+        with self.lock:
+            self.f.write(line + "\n"); self.f.flush()
+
+class Replay:
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.answers: Dict[str,collections.deque] = {}
+        self.latency: Dict[str,List[float]] = {}
+        with open(path) as f:
+            for line in f:
+                r = json.loads(line)
+                self.answers.setdefault(self.key(r["method"], r["params"]), collections.deque()).append(r)
+                self.latency.setdefault(r["method"], []).append(float(r.get("secs", 0)))
+
+    @staticmethod
+    def key(method: str, params: list) -> str:
+        return json.dumps([method, params], sort_keys=True)
+
+    def get(self, method: str, params: list) -> Optional[Dict[str,Any]]:
+        with self.lock:
+            q = self.answers.get(self.key(method, params))
+            if not q:
+                return None
+            return q.popleft() if len(q) > 1 else q[0]
+
+    def delay(self, method: str) -> Optional[float]:
+        xs = self.latency.get(method)
+        return statistics.median(xs) if xs else None
+
+REPLAY_METHODS = ("eth_chainId", "net_version", "eth_call", "eth_estimateGas", "eth_getBlockByNumber", "eth_gasPrice", "eth_maxPriorityFeePerGas")
+
+class MockNode:
+    def __init__(self, port: int = 0, latency: float = 0.0, jitter: float = 0.0, block_time: float = 1.0,
+                 upstream: Optional[str] = None, record: Optional[str] = None, replay: Optional[str] = None):
+        self.chain = MockChain(block_time)
+        self.latency = latency; self.jitter = jitter
+        self.upstream = upstream
+        self.session = requests.Session()
+        self.recorder = Recorder(record) if record else None
+        self.replay = Replay(replay) if replay else None
+        node = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = -1
+            def log_message(self, *a): pass
+            def reply(self, body: bytes):
+                self.send_response(200); self.send_header("Content-Type","application/json"); self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                out = [node.handle(r) for r in body] if isinstance(body, list) else node.handle(body)
+                self.reply(json.dumps(out).encode())
+            def do_GET(self):
+                self.reply(json.dumps({"proof": "0x" + "ab"*64}).encode())
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def pause(self, method: str):
+        d = (self.replay.delay(method) if self.replay else None)
+        d = self.latency if d is None else d
+        if self.jitter: d += abs(random.gauss(0, self.jitter))
+        if d > 0: time.sleep(d)
+
+    def handle(self, req: Dict[str,Any]) -> Dict[str,Any]:
+        m = req.get("method"); p = req.get("params") or []
+        self.chain.counts[m] += 1
+        t0 = time.perf_counter()
+        if self.upstream:
+            resp = self.session.post(self.upstream, json=req, timeout=60).json()
+        else:
+            self.pause(m)
+            hit = self.replay.get(m, p) if self.replay and m in REPLAY_METHODS else None
+            if hit is not None:
+                resp = {"jsonrpc": "2.0", "id": req.get("id"), **({"error": hit["error"]} if hit.get("error") is not None else {"result": hit["result"]})}
+            else:
+                try: resp = {"jsonrpc": "2.0", "id": req.get("id"), "result": self.chain.dispatch(m, p)}
+                except Exception as e: resp = {"jsonrpc": "2.0", "id": req.get("id"), "error": {"code": -32000, "message": str(e)}}
+        if self.recorder: self.recorder.write(req, resp, time.perf_counter() - t0)
+        return resp
+
+    def start(self) -> "MockNode":
+        threading.Thread(target=self.server.serve_forever, name="mock-node", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown(); self.server.server_close()
+
+def pct(xs: List[float], q: float) -> float:
+    if not xs: return 0.0
+    xs = sorted(xs); return xs[min(len(xs)-1, max(0, int(round(q * (len(xs)-1)))))]
+
+class Probe:
+    def __init__(self, main):
+        self.lock = threading.Lock(); self.tx: List[float] = []; self.rpc: List[float] = []
+        sign_send_wait = main.sign_send_wait; post = main.PROVIDERS.session.post
+        def timed_send(*a, **kw):
+            t0 = time.perf_counter()
+            try: return sign_send_wait(*a, **kw)
+            finally:
+                with self.lock: self.tx.append(time.perf_counter() - t0)
+        def timed_post(*a, **kw):
+            t0 = time.perf_counter()
+            try: return post(*a, **kw)
+            finally:
+                with self.lock: self.rpc.append(time.perf_counter() - t0)
+        main.sign_send_wait = timed_send; main.PROVIDERS.session.post = timed_post
+
+    def take(self) -> Tuple[List[float],List[float]]:
+        with self.lock:
+            tx, rpc, self.tx, self.rpc = self.tx, self.rpc, [], []
+        return tx, rpc
+
+def bench_config(main, runs: int) -> Dict[str,Any]:
+    cfg = main.load_config()
+    for k in cfg["programs"]: cfg["programs"][k]["delay"] = 0
+    cfg["programs"]["p1"]["repeat"] = runs; cfg["programs"]["p2"]["count"] = runs; cfg["programs"]["p3"]["swap_times"] = runs
+    cfg["programs"]["p3"]["stake_mode"] = "fixed"; cfg["programs"]["p3"]["stake_times"] = runs
+    for k in ("p4","p5","p6"): cfg["programs"][k]["runs"] = runs
+    return cfg
+
+def bench_wallets(main, n: int, offset: int) -> list:
+    keys = [f"0x{offset + i + 1:064x}" for i in range(n)]
+    return [main.AccountRec(k, a, None, f"#{i+1}") for i, (k, a) in enumerate(zip(keys, main.derive_addresses(keys)))]
+
+def measure(name: str, node: MockNode, probe: Probe, fn) -> Dict[str,Any]:
+    before = sum(node.chain.counts.values()); sent = node.chain.counts["eth_sendRawTransaction"]; probe.take()
+    t0 = time.perf_counter(); fn(); elapsed = time.perf_counter() - t0
+    tx_lat, rpc_lat = probe.take()
+    txs = node.chain.counts["eth_sendRawTransaction"] - sent; rpcs = sum(node.chain.counts.values()) - before
+    return {"name": name, "secs": elapsed, "txs": txs, "rpcs": rpcs, "tx_per_s": txs / elapsed if elapsed else 0.0, "rpc_per_tx": rpcs / txs if txs else 0.0,
+            "tx_p50": pct(tx_lat, 0.5), "tx_p99": pct(tx_lat, 0.99), "rpc_p50": pct(rpc_lat, 0.5), "rpc_p99": pct(rpc_lat, 0.99)}
+
+def run_bench(args) -> List[Dict[str,Any]]:
+    node = MockNode(latency=args.latency/1000, jitter=args.jitter/1000, block_time=args.block_time, replay=args.replay).start()
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix="pharos-bench-"); os.chdir(workdir)
+    os.environ.update({"RPC_URL": node.url, "TX_DELAY_JITTER_SECS": "0", "COMMIT_EXTRA_WAIT_SEC": "0", "METRICS_EXPORT_SECS": "0"})
+    t0 = time.perf_counter(); import main; import_secs = time.perf_counter() - t0
+    main.BROKEX_PROOF_API = f"{node.url}/proof?pairs="
+    probe = Probe(main); cfg = bench_config(main, args.runs); quiet = not args.verbose
+    if quiet: main.console.quiet = True
+    rows = []
+    try:
+        progs = [int(x) for x in args.programs.split(",") if x.strip()]
+        for n in progs:
+            rec = bench_wallets(main, 1, 1000 * n)[0]
+            rows.append(measure(f"P{n}", node, probe, lambda: getattr(main, f"run_program_{n}")(rec, cfg["programs"][f"p{n}"])))
+        if args.accounts > 0:
+            ws = bench_wallets(main, args.accounts, 10_000); cfg["global"]["workers"] = args.workers; cfg["global"]["max_rps"] = args.max_rps
+            rows.append(measure(f"cycle {args.accounts}x{args.workers}", node, probe, lambda: main.run_cycle(cfg, ws)))
+    finally:
+        main.console.quiet = False; node.stop()
+    main.console.print(f"[muted]import main: {import_secs*1000:.0f} ms • workdir {workdir}[/muted]")
+    return rows
+
+def report(rows: List[Dict[str,Any]]):
+    from rich.console import Console
+    from rich.table import Table
+    from rich import box
+    t = Table(box=box.ROUNDED, header_style="bold cyan")
+    for c in ("Run", "Durasi (s)", "TX", "TX/s", "RPC/TX", "TX p50 (s)", "TX p99 (s)", "RPC p50 (ms)", "RPC p99 (ms)"): t.add_column(c, justify="right")
+    for r in rows:
+        t.add_row(r["name"], f"{r['secs']:.2f}", str(r["txs"]), f"{r['tx_per_s']:.2f}", f"{r['rpc_per_tx']:.2f}", f"{r['tx_p50']:.2f}", f"{r['tx_p99']:.2f}",
+                  f"{r['rpc_p50']*1000:.1f}", f"{r['rpc_p99']*1000:.1f}")
+    Console().print(t)
+
+def main_cli(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Benchmark runner terhadap mock JSON-RPC lokal")
+    ap.add_argument("--programs", default="1,2,3,4,5,6", help="program yang dijalankan satu per satu, mis. 1,3,4")
+    ap.add_argument("--runs", type=int, default=2, help="jumlah tx utama per program (repeat/count/runs)")
+    ap.add_argument("--accounts", type=int, default=8, help="jumlah akun untuk satu siklus All in One (0 = lewati)")
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--max-rps", type=int, default=0)
+    ap.add_argument("--latency", type=float, default=20.0, help="latensi per request (ms)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="deviasi latensi (ms)")
+    ap.add_argument("--block-time", type=float, default=1.0, help="waktu blok mock (s)")
+    ap.add_argument("--replay", help="putar ulang respons read-only dari file rekaman JSONL")
+    ap.add_argument("--serve", action="store_true", help="hanya jalankan node (mock atau proxy perekam) sampai Ctrl+C")
+    ap.add_argument("--port", type=int, default=8545)
+    ap.add_argument("--upstream", help="mode proxy: teruskan request ke RPC ini (dipakai bersama --record)")
+    ap.add_argument("--record", help="rekam semua request/respons ke file JSONL")
+    ap.add_argument("--json", help="simpan hasil ke file JSON (baseline regresi)")
+    ap.add_argument("--verbose", action="store_true", help="tampilkan log runner")
+    args = ap.parse_args(argv)
+    if args.serve:
+        node = MockNode(args.port, args.latency/1000, args.jitter/1000, args.block_time, args.upstream, args.record, args.replay)
+        print(f"Node {'proxy → ' + args.upstream if args.upstream else 'mock'} di {node.url} (Ctrl+C untuk berhenti)")
+        try: node.server.serve_forever()
+        except KeyboardInterrupt: node.stop()
+        return
+    rows = run_bench(args)
+    report(rows)
+    if args.json:
+        with open(args.json, "w") as f: json.dump({"args": vars(args), "rows": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,140 @@
+import os, sys, json, re, time, argparse
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+CONFIG_PATH = "runner_config.json"
+WALLETS_JSON = "wallets.json"
+WALLETS_TXT = "wallets.txt"
+PROXIES_TXT = "proxies.txt"
+PROGRAM_KEYS = ("p1","p2","p3","p4","p5","p6")
+PK_RE = re.compile(r"(0[xX])?[0-9a-fA-F]{1,64}")
+ADDR_RE = re.compile(r"0x[0-9a-fA-F]{40}")
+PROXY_RE = re.compile(r"(http|https|socks5h?)://\S+", re.I)
+
+def parse_programs(spec: str) -> List[str]:
+    keys = []
+    for part in spec.lower().replace(" ","").split(","):
+        if not part: continue
+        k = part if part.startswith("p") else f"p{part}"
+        if k not in PROGRAM_KEYS: raise ValueError(f"program tidak dikenal: {part}")
+        if k not in keys: keys.append(k)
+    if not keys: raise ValueError("daftar program kosong")
+    return keys
+
+def parse_accounts(spec: Optional[str], n: int) -> List[int]:
+    if not spec or spec.lower() == "all":
+        return list(range(n))
+    idx = []
+    for part in spec.replace(" ","").split(","):
+        if not part: continue
+        a, _, b = part.partition("-")
+        lo = int(a); hi = int(b) if b else lo
+        if lo < 1 or hi < lo: raise ValueError(f"rentang akun tidak valid: {part}")
+        idx += [i - 1 for i in range(lo, min(hi, n) + 1) if i - 1 not in idx]
+    if not idx: raise ValueError(f"tidak ada akun dalam rentang {spec} (total {n})")
+    return idx
+
+def wallet_keys() -> Tuple[str, List[str]]:
+    if Path(WALLETS_JSON).exists():
+        data = json.loads(Path(WALLETS_JSON).read_text())
+        keys = [str((it.get("private_key") if isinstance(it, dict) else it) or "").strip() for it in data]
+        if any(keys): return WALLETS_JSON, [k for k in keys if k]
+    if Path(WALLETS_TXT).exists():
+        keys = [L.strip().split(",")[0].strip() for L in Path(WALLETS_TXT).read_text().splitlines() if L.strip() and not L.strip().startswith("#")]
+        if keys: return WALLETS_TXT, keys
+    pk = os.getenv("PRIVATE_KEY","").strip()
+    return ("PRIVATE_KEY", [pk]) if pk else ("-", [])
+
+def validate(programs: List[str]) -> List[str]:
+    errors = []
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(Path(__file__).with_name(".env"))
+    except Exception as e:
+        errors.append(f".env: {e}")
+    for url in os.getenv("RPC_URL","https://testnet.dplabs-internal.com").split(","):
+        if url.strip() and not re.match(r"^https?://", url.strip()): errors.append(f"RPC_URL harus http(s)://: {url.strip()}")
+    if not os.getenv("CHAIN_ID","688688").strip().isdigit(): errors.append("CHAIN_ID harus angka")
+    if Path(CONFIG_PATH).exists():
+        try:
+            cfg = json.loads(Path(CONFIG_PATH).read_text())
+            g = cfg.get("global", {})
+            for k in ("aio_sleep_hours","workers","max_rps"):
+                if k in g and not isinstance(g[k], int): errors.append(f"{CONFIG_PATH}: global.{k} harus bilangan bulat")
+            for k in programs:
+                p = cfg.get("programs", {}).get(k, {})
+                if not isinstance(p, dict): errors.append(f"{CONFIG_PATH}: programs.{k} harus objek"); continue
+                if "delay" in p and (not isinstance(p["delay"], int) or p["delay"] < 0): errors.append(f"{CONFIG_PATH}: programs.{k}.delay harus >= 0")
+        except Exception as e:
+            errors.append(f"{CONFIG_PATH}: JSON tidak valid ({e})")
+    try:
+        src, keys = wallet_keys()
+    except Exception as e:
+        src, keys = WALLETS_JSON, []; errors.append(f"{WALLETS_JSON}: {e}")
+    if not keys: errors.append("Tidak ada akun. Set PRIVATE_KEY di .env atau wallets.json/wallets.txt")
+    for i, k in enumerate(keys, 1):
+        if not PK_RE.fullmatch(k) or int(k, 16) == 0: errors.append(f"{src}: private key #{i} tidak valid")
+    if Path(PROXIES_TXT).exists():
+        for no, L in enumerate(Path(PROXIES_TXT).read_text().splitlines(), 1):
+            L = L.strip()
+            if not L or L.startswith("#"): continue
+            px = L.split("=",1)[1].strip() if L.lower().startswith(("default=","all=")) else L
+            if "," in px:
+                addr, px = [x.strip() for x in px.split(",",1)]
+                if not ADDR_RE.fullmatch(addr): errors.append(f"{PROXIES_TXT}:{no}: alamat tidak valid")
+            if not PROXY_RE.fullmatch(px): errors.append(f"{PROXIES_TXT}:{no}: proxy harus http(s):// atau socks5(h)://")
+    return errors
+
+def cmd_validate(args) -> int:
+    t0 = time.perf_counter()
+    try: programs = parse_programs(args.programs)
+    except ValueError as e: print(f"ERROR {e}"); return 2
+    errors = validate(programs)
+    for e in errors: print(f"ERROR {e}")
+    src, keys = wallet_keys() if not errors else ("-", [])
+    if not errors:
+        try: sel = parse_accounts(args.accounts, len(keys))
+        except ValueError as e: print(f"ERROR {e}"); return 2
+        print(f"OK {len(sel)}/{len(keys)} akun ({src}) • program {','.join(programs)} • {(time.perf_counter()-t0)*1000:.0f} ms")
+    return 2 if errors else 0
+
+def cmd_run(args) -> int:
+    if args.validate:
+        return cmd_validate(args)
+    try: programs = parse_programs(args.programs)
+    except ValueError as e: print(f"ERROR {e}"); return 2
+    import main
+    cfg = main.load_config()
+    if args.workers: cfg["global"]["workers"] = args.workers
+    if args.max_rps is not None: cfg["global"]["max_rps"] = args.max_rps
+    main.warm_token_meta()
+    wallets = main.load_accounts()
+    try: sel = parse_accounts(args.accounts, len(wallets))
+    except ValueError as e: main.console.print(f"[err]{e}[/err]"); return 2
+    progs = [p for p in main.PROGRAMS if p[1] in programs]
+    try:
+        ok = main.all_in_one(cfg, [wallets[i] for i in sel], progs, once=args.once)
+    except KeyboardInterrupt:
+        main.console.print("\n[warn]Dihentikan oleh user.[/warn]"); return 130
+    return 130 if ok is None else (0 if ok else 1)
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="cli.py", description="Pharos runner tanpa menu (cron/systemd)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, help_ in (("run", "jalankan program untuk akun terpilih"), ("validate", "cek .env, config, wallets & proxies tanpa memuat web3")):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("--programs", default=",".join(PROGRAM_KEYS), help="mis. p1,p3 (default semua)")
+        p.add_argument("--accounts", default="all", help="nomor akun 1-based, mis. 1-50 atau 1,3,7-9 (default all)")
+        if name == "run":
+            p.add_argument("--once", action="store_true", help="satu siklus lalu keluar (tanpa tidur 24 jam)")
+            p.add_argument("--workers", type=int, help="override global.workers")
+            p.add_argument("--max-rps", type=int, help="override global.max_rps")
+            p.add_argument("--validate", action="store_true", help="hanya validasi, tidak menjalankan apa pun")
+    return ap
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return cmd_run(args) if args.cmd == "run" else cmd_validate(args)
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,4 +1,6 @@
-import os, sys, json, re, time, random
+import os, sys, json, re, time, random, threading, itertools, heapq, math, atexit, contextvars, queue
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait as futures_wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
 from decimal import Decimal
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Tuple
@@ -6,8 +8,9 @@ from typing import Optional, Dict, Any, List, Tuple
 import requests
 from dotenv import load_dotenv
 from web3 import Web3
+from web3.datastructures import AttributeDict
 from eth_account import Account
-from eth_abi import encode as abi_encode
+from eth_abi import encode as abi_encode, decode as abi_decode
 from eth_utils import keccak, to_checksum_address
 from hexbytes import HexBytes
 from rich.console import Console
@@ -16,13 +19,26 @@ from rich.table import Table
 from rich.rule import Rule
 from rich import box
 from rich.theme import Theme
+from rich.text import Text
+from rich.console import Group
 from rich.progress import Progress, SpinnerColumn, BarColumn, TimeRemainingColumn, TextColumn
 
 theme = Theme({"title":"bold cyan","ok":"bold green","err":"bold red","warn":"bold yellow","muted":"grey66","accent":"magenta"})
-console = Console(theme=theme)
+
+class RunnerConsole(Console):
+    def print(self, *objects, **kw):
+        fields = kw.pop("fields", None)
+        if RUN_CTX.get() is not None and LOG.enabled:
+            LOG.emit(objects, kw, fields or {}, render=True)
+            return
+        super().print(*objects, **kw)
+        if fields is not None: LOG.emit(objects, kw, fields, render=False)
+
+console = RunnerConsole(theme=theme)
 
 load_dotenv()
-RPC_URL = os.getenv("RPC_URL","https://testnet.dplabs-internal.com").strip()
+RPC_URLS = list(dict.fromkeys(u.strip() for u in os.getenv("RPC_URL","https://testnet.dplabs-internal.com").split(",") if u.strip())) or ["https://testnet.dplabs-internal.com"]
+RPC_URL = RPC_URLS[0]
 EXPLORER_BASE = os.getenv("EXPLORER_BASE","https://testnet.pharosscan.xyz").rstrip("/")
 CHAIN_ID = int(os.getenv("CHAIN_ID","688688"))
 PRIVATE_KEY_ENV = os.getenv("PRIVATE_KEY","").strip()
@@ -30,11 +46,72 @@ WAIT_TIMEOUT_SECS = int(os.getenv("WAIT_TIMEOUT_SECS","600"))
 TX_DELAY_JITTER_SECS = int(os.getenv("TX_DELAY_JITTER_SECS","30"))
 MAX_PRIORITY_GWEI = int(os.getenv("MAX_PRIORITY_GWEI","2"))
 FEE_BUMP_PCT = float(os.getenv("FEE_BUMP_PCT","0.20"))
+MAX_RETRIES_PER_TX = int(os.getenv("MAX_RETRIES_PER_TX","3"))
+REPLACE_AFTER_BLOCKS = int(os.getenv("REPLACE_AFTER_BLOCKS","15"))
+RECEIPT_POLL_SECS = float(os.getenv("RECEIPT_POLL_SECS","1"))
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE","20"))
+RPC_TIMEOUT_SECS = int(os.getenv("RPC_TIMEOUT_SECS","60"))
+RPC_RETRIES = int(os.getenv("RPC_RETRIES","4"))
+RPC_BACKOFF_BASE = float(os.getenv("RPC_BACKOFF_BASE","0.5"))
+RPC_BACKOFF_MAX = float(os.getenv("RPC_BACKOFF_MAX","30"))
+RPC_AIMD_DECREASE = float(os.getenv("RPC_AIMD_DECREASE","0.5"))
+RPC_AIMD_MIN_RPS = float(os.getenv("RPC_AIMD_MIN_RPS","1"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD","8"))
+BREAKER_COOLDOWN_SECS = float(os.getenv("BREAKER_COOLDOWN_SECS","15"))
+BREAKER_MAX_SECS = float(os.getenv("BREAKER_MAX_SECS","300"))
+RPC_PROBE_SECS = float(os.getenv("RPC_PROBE_SECS","5"))
+RPC_MAX_LAG_BLOCKS = int(os.getenv("RPC_MAX_LAG_BLOCKS","3"))
+RPC_ENDPOINT_COOLDOWN_SECS = float(os.getenv("RPC_ENDPOINT_COOLDOWN_SECS","30"))
+RPC_HEDGE_PCT = float(os.getenv("RPC_HEDGE_PCT","0.9"))
+RPC_HEDGE_MIN_MS = float(os.getenv("RPC_HEDGE_MIN_MS","100"))
+RPC_WS_URL = os.getenv("RPC_WS_URL","").strip()
+WS_STALE_BLOCKS = int(os.getenv("WS_STALE_BLOCKS","5"))
+PIPELINE_ENABLED = os.getenv("PIPELINE","0").strip().lower() in ("1","true","yes","y")
+MULTICALL3_ADDRESS = os.getenv("MULTICALL3_ADDRESS","0xcA11bde05977b3631167028862bE2a173976CA11")
+MULTICALL_CHUNK = int(os.getenv("MULTICALL_CHUNK","200"))
+BLOCK_INTERVAL_SECS = float(os.getenv("BLOCK_INTERVAL_SECS","2"))
+GAS_PROFILE_WINDOW = int(os.getenv("GAS_PROFILE_WINDOW","50"))
+GAS_PROFILE_MIN_SAMPLES = int(os.getenv("GAS_PROFILE_MIN_SAMPLES","5"))
+GAS_PROFILE_PCT = float(os.getenv("GAS_PROFILE_PCT","0.95"))
+GAS_PROFILE_MARGIN = float(os.getenv("GAS_PROFILE_MARGIN","0.25"))
+NONCE_RESERVE_TTL = int(os.getenv("NONCE_RESERVE_TTL","30"))
+JOURNAL_FSYNC_SECS = float(os.getenv("JOURNAL_FSYNC_SECS","1"))
+METRICS_EXPORT_SECS = float(os.getenv("METRICS_EXPORT_SECS","15"))
+WALLET_DERIVE_CHUNK = int(os.getenv("WALLET_DERIVE_CHUNK","2000"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE","10000"))
+LOG_REFRESH_HZ = float(os.getenv("LOG_REFRESH_HZ","10"))
+PREFLIGHT_ENABLED = os.getenv("PREFLIGHT","1").strip().lower() not in ("0","false","no","n")
+PREFLIGHT_GAS_PER_TX = int(os.getenv("PREFLIGHT_GAS_PER_TX","300000"))
+SIMULATE_ENABLED = os.getenv("SIMULATE","0").strip().lower() in ("1","true","yes","y")
+REVERT_CACHE_TTL = int(os.getenv("REVERT_CACHE_TTL","900"))
+REVERT_CACHE_MIN_HITS = int(os.getenv("REVERT_CACHE_MIN_HITS","2"))
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+NONCE_RESYNC_ERRORS = ("nonce too low", "replacement transaction underpriced", "replacement underpriced")
+NON_IDEMPOTENT_METHODS = ("eth_sendRawTransaction", "eth_sendTransaction")
+RPC_THROTTLE_HINTS = ("rate limit", "too many requests", "request limit", "exceeded the limit")
+HEDGE_METHODS = ("eth_call", "eth_getTransactionReceipt", "eth_getTransactionByHash")
+ERROR_SELECTOR = "0x08c379a0"
+PANIC_SELECTOR = "0x4e487b71"
+PANIC_CODES = {0x01:"assert",0x11:"overflow/underflow",0x12:"division by zero",0x21:"invalid enum",0x31:"pop empty array",0x32:"index out of bounds",0x41:"out of memory",0x51:"zero function"}
+REVERT_SIGNATURES = ("ERC20InsufficientBalance(address,uint256,uint256)", "ERC20InsufficientAllowance(address,uint256,uint256)", "ERC20InvalidSender(address)", "ERC20InvalidReceiver(address)",
+                     "OwnableUnauthorizedAccount(address)", "SafeERC20FailedOperation(address)", "ReentrancyGuardReentrantCall()", "EnforcedPause()")
+REVERT_SHARED_HINTS = ("enforcedpause(", "paused", "market closed", "market is closed", "trading closed", "not open")
 
 CONFIG_PATH = "runner_config.json"
 WALLETS_JSON = "wallets.json"
 WALLETS_TXT = "wallets.txt"
 PROXIES_TXT = "proxies.txt"
+TOKEN_META_PATH = str(Path(CONFIG_PATH).with_name("token_meta.json"))
+GAS_PROFILES_PATH = str(Path(CONFIG_PATH).with_name("gas_profiles.json"))
+JOURNAL_PATH = str(Path(CONFIG_PATH).with_name("run_journal.jsonl"))
+WALLET_CACHE_PATH = str(Path(CONFIG_PATH).with_name("wallet_addrs.json"))
+LOG_JSONL_PATH = os.getenv("LOG_JSONL", str(Path(CONFIG_PATH).with_name("runner_log.jsonl")))
+HEX_PK_RE = re.compile(r"[0-9a-fA-F]{1,64}")
+ADDRESS_RE = re.compile(r"^0x[0-9a-fA-F]{40}$")
+PROXY_URL_RE = re.compile(r"^(http|https|socks5h?|SOCKS5H?)://")
+METRICS_PROM_PATH = os.getenv("METRICS_TEXTFILE", str(Path(CONFIG_PATH).with_name("metrics.prom")))
+METRICS_JSON_PATH = os.getenv("METRICS_JSON", str(Path(CONFIG_PATH).with_name("metrics.json")))
+JOURNAL_PREP_LABELS = ("approve", "commit", "cancel")
 
 POOL_ADDRESS   = os.getenv("POOL_ADDRESS","0x11d1ca4012d94846962bca2FBD58e5A27ddcBfC5")
 ASSET_USDC     = os.getenv("ASSET_USDC","")
@@ -64,6 +141,9 @@ BROKEX_USDT_ADDRESS         = "0x78ac5e2d8a78a8b8e6d10c7b7274b03c10c91cef"
 BROKEX_TRADE_ROUTER_ADDRESS = "0x34f89ca5a1c6dc4eb67dfe0af5b621185df32854"
 BROKEX_POOL_ROUTER_ADDRESS  = "0x9A88d07850723267DB386C681646217Af7e220d7"
 BROKEX_PROOF_API            = "https://proof.brokex.trade/proof?pairs="
+BROKEX_PROOF_TTL            = int(os.getenv("BROKEX_PROOF_TTL","20"))
+BROKEX_PROOF_IDLE_SECS      = int(os.getenv("BROKEX_PROOF_IDLE_SECS","600"))
+BROKEX_PROOF_PROXY          = os.getenv("BROKEX_PROOF_PROXY","").strip() or None
 BROKEX_PAIRS = [{"name":"BTC_USDT","idx":0},{"name":"ETH_USDT","idx":1},{"name":"LINK_USDT","idx":2},{"name":"SOL_USDT","idx":10}]
 
 TOKEN_ADDRESS_P5    = os.getenv("TOKEN_ADDRESS","0xD4071393f8716661958F766DF660033b3d35fD29")
@@ -125,6 +205,41 @@ DEPOSIT_ABI = [
 
 MAX_UINT256 = (1<<256)-1
 
+def abi_type(p: Dict[str,Any]) -> str:
+    if p["type"].startswith("tuple"):
+        return "(" + ",".join(abi_type(c) for c in p["components"]) + ")" + p["type"][5:]
+    return p["type"]
+
+class FnCodec:
+    __slots__ = ("name", "signature", "selector", "in_types", "out_types")
+
+    def __init__(self, f: Dict[str,Any]):
+        self.name = f["name"]
+        self.in_types = [abi_type(i) for i in f.get("inputs", [])]
+        self.out_types = [abi_type(o) for o in f.get("outputs", [])]
+        self.signature = f"{self.name}({','.join(self.in_types)})"
+        self.selector = keccak(text=self.signature)[:4]
+
+    def encode(self, *args) -> bytes:
+        return self.selector + abi_encode(self.in_types, list(args)) if self.in_types else self.selector
+
+    def decode(self, raw) -> Any:
+        out = abi_decode(self.out_types, bytes(raw))
+        return out[0] if len(out) == 1 else out
+
+def abi_codecs(abi: List[Dict[str,Any]]) -> Dict[str,FnCodec]:
+    return {f["name"]: FnCodec(f) for f in abi if f.get("type") == "function"}
+
+ERC20      = abi_codecs(ERC20_ABI)
+POOL       = abi_codecs(POOL_ABI)
+FAUCET     = abi_codecs(FAUCET_ABI)
+CONTROLLER_FNS = abi_codecs(CONTROLLER_ABI)
+RESOLVER_FNS   = abi_codecs(RESOLVER_ABI)
+BROKEX     = abi_codecs(BROKEX_ABI)
+DEPOSIT    = abi_codecs(DEPOSIT_ABI)
+AGGREGATE3 = FnCodec({"name":"aggregate3","inputs":[{"type":"tuple[]","components":[{"type":"address"},{"type":"bool"},{"type":"bytes"}]}],
+                      "outputs":[{"type":"tuple[]","components":[{"type":"bool"},{"type":"bytes"}]}]})
+
 def fmt_addr(a: str) -> str:
     return f"{a[:6]}…{a[-4:]}"
 
@@ -134,59 +249,1006 @@ def tx_link(h: str) -> str:
 def gwei(x: float) -> int:
     return int(Decimal(x) * Decimal(1_000_000_000))
 
+class Metrics:
+    def __init__(self, prom_path: str, json_path: str, export_secs: float):
+        self.prom_path = prom_path; self.json_path = json_path; self.export_secs = export_secs
+        self.lock = threading.Lock()
+        self.counters: Dict[str,Dict[Tuple,float]] = {}
+        self.gauges: Dict[str,Dict[Tuple,float]] = {}
+        self.hists: Dict[str,Dict[Tuple,List[float]]] = {}
+        self.thread: Optional[threading.Thread] = None
+        self.started = time.time()
+
+    @staticmethod
+    def key(labels: Dict[str,Any]) -> Tuple:
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        k = self.key(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {}); series[k] = series.get(k, 0.0) + value
+        self.start()
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges.setdefault(name, {})[self.key(labels)] = float(value)
+        self.start()
+
+    def observe(self, name: str, value: float, **labels):
+        k = self.key(labels)
+        with self.lock:
+            h = self.hists.setdefault(name, {}).get(k)
+            if h is None:
+                h = self.hists[name][k] = [0.0] * (len(METRICS_BUCKETS) + 2)
+            for i, b in enumerate(METRICS_BUCKETS):
+                if value <= b:
+                    h[i] += 1; break
+            else:
+                h[len(METRICS_BUCKETS)] += 1
+            h[-1] += value
+        self.start()
+
+    @staticmethod
+    def fmt(labels: Tuple, extra: Tuple = ()) -> str:
+        items = labels + extra
+        if not items:
+            return ""
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+    @staticmethod
+    def num(v: float) -> str:
+        return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+    def prometheus(self) -> str:
+        out = []
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                out.append(f"# TYPE runner_{name} counter")
+                out += [f"runner_{name}{self.fmt(k)} {self.num(v)}" for k, v in sorted(series.items())]
+            for name, series in sorted(self.gauges.items()):
+                out.append(f"# TYPE runner_{name} gauge")
+                out += [f"runner_{name}{self.fmt(k)} {self.num(v)}" for k, v in sorted(series.items())]
+            for name, series in sorted(self.hists.items()):
+                out.append(f"# TYPE runner_{name} histogram")
+                for k, h in sorted(series.items()):
+                    acc = 0.0
+                    for b, c in zip(METRICS_BUCKETS, h):
+                        acc += c; out.append(f"runner_{name}_bucket{self.fmt(k, (('le', f'{b:g}'),))} {self.num(acc)}")
+                    acc += h[len(METRICS_BUCKETS)]
+                    out.append(f"runner_{name}_bucket{self.fmt(k, (('le', '+Inf'),))} {self.num(acc)}")
+                    out.append(f"runner_{name}_sum{self.fmt(k)} {h[-1]:.6f}")
+                    out.append(f"runner_{name}_count{self.fmt(k)} {self.num(acc)}")
+        return "\n".join(out) + "\n"
+
+    def snapshot(self) -> Dict[str,Any]:
+        def series(d): return [{"labels": dict(k), "value": v} for k, v in sorted(d.items())]
+        with self.lock:
+            snap = {"ts": time.time(), "uptime": time.time() - self.started,
+                    "counters": {n: series(d) for n, d in self.counters.items()},
+                    "gauges": {n: series(d) for n, d in self.gauges.items()},
+                    "histograms": {}}
+            for name, d in self.hists.items():
+                snap["histograms"][name] = [{"labels": dict(k), "count": sum(h[:-1]), "sum": h[-1],
+                                             "buckets": dict(zip([f"{b:g}" for b in METRICS_BUCKETS] + ["+Inf"], h[:-1]))} for k, h in sorted(d.items())]
+        return snap
+
+    def export(self):
+        if self.thread is None:
+            return
+        for path, body in ((self.prom_path, self.prometheus()), (self.json_path, json.dumps(self.snapshot(), indent=1))):
+            if not path:
+                continue
+            tmp = path + ".tmp"
+            Path(tmp).write_text(body); os.replace(tmp, path)
+
+    def start(self):
+        if self.thread is None and self.export_secs > 0:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="metrics", daemon=True); self.thread.start()
+
+    def run(self):
+        while True:
+            time.sleep(self.export_secs)
+            try: self.export()
+            except Exception as e: console.print(f"[warn]Export metrics gagal: {e}[/warn]")
+
+METRICS = Metrics(METRICS_PROM_PATH, METRICS_JSON_PATH, METRICS_EXPORT_SECS)
+atexit.register(METRICS.export)
+
+class LogSink:
+    def __init__(self, path: str, maxsize: int, hz: float):
+        self.path = path
+        self.q: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.interval = 1.0 / hz if hz > 0 else 0.0
+        self.enabled = maxsize > 0
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.dropped = 0
+
+    def emit(self, objects: tuple, kw: Dict[str,Any], fields: Dict[str,Any], render: bool):
+        ctx = RUN_CTX.get()
+        rec = {"t": round(time.time(), 3), **({k: ctx.get(k) for k in ("acct","prog","step")} if ctx else {}), **fields}
+        try:
+            self.q.put_nowait((objects, kw, rec, render))
+        except queue.Full:
+            with self.lock: self.dropped += 1
+            METRICS.inc("log_dropped_total")
+            return
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name="log-sink", daemon=True); self.thread.start()
+
+    @staticmethod
+    def plain(obj: Any) -> str:
+        if isinstance(obj, str): return Text.from_markup(obj).plain
+        if isinstance(obj, Panel): return LogSink.plain(obj.renderable)
+        if isinstance(obj, Text): return obj.plain
+        return ""
+
+    def render(self, batch: List[tuple]):
+        group: List[Any] = []
+        def flush():
+            if group: Console.print(console, Group(*group)); group.clear()
+        for objects, kw, rec, render in batch:
+            if not render: continue
+            acct = rec.get("acct")
+            items = [Text.from_markup(o) if isinstance(o, str) else o for o in objects]
+            if acct and items and isinstance(items[0], Text):
+                items[0] = Text.assemble((f"{fmt_addr(acct)} ", "muted"), items[0])
+            if kw:
+                flush(); Console.print(console, *items, **kw)
+            else:
+                group.extend(items)
+        flush()
+        with self.lock:
+            n, self.dropped = self.dropped, 0
+        if n:
+            Console.print(console, f"[warn]{n} baris log dibuang (antrian penuh)[/warn]")
+
+    def write(self, batch: List[tuple]):
+        if not self.path:
+            return
+        lines = []
+        for objects, _, rec, _ in batch:
+            msg = " ".join(filter(None, (self.plain(o) for o in objects)))
+            if msg or "ev" in rec: lines.append(json.dumps({**rec, "msg": msg}, separators=(",",":"), default=str))
+        if not lines:
+            return
+        with open(self.path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+    def run(self):
+        while True:
+            batch = [self.q.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < 1000:
+                left = deadline - time.monotonic()
+                try: batch.append(self.q.get(timeout=left) if left > 0 else self.q.get_nowait())
+                except queue.Empty: break
+            try:
+                self.render(batch); self.write(batch)
+            except Exception as e:
+                Console.print(console, f"[warn]Log sink error: {e}[/warn]")
+            finally:
+                for _ in batch: self.q.task_done()
+
+    def drain(self):
+        if self.thread is not None:
+            self.q.join()
+
+LOG = LogSink(LOG_JSONL_PATH, LOG_QUEUE_SIZE, LOG_REFRESH_HZ)
+atexit.register(LOG.drain)
+
+def tx_kind(label: str) -> str:
+    return (label.split() or ["tx"])[0].lower()
+
+class FeeCache:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.eip1559: Dict[str,bool] = {}
+        self.heads: Dict[str,Dict[str,Any]] = {}
+
+    def key(self, w3: Web3) -> str:
+        return str(getattr(w3.provider, "endpoint_uri", None) or id(w3.provider))
+
+    def fresh(self, k: str) -> Optional[Dict[str,Any]]:
+        with self.lock:
+            cur = self.heads.get(k)
+        if cur and time.time() - cur["ts"] < (HEADS.stale_secs if HEADS.live else BLOCK_INTERVAL_SECS):
+            return cur
+        return None
+
+    def update(self, k: str, number: int, base_fee: Optional[int]) -> Dict[str,Any]:
+        with self.lock:
+            if k not in self.eip1559:
+                self.eip1559[k] = base_fee is not None
+            cur = self.heads.get(k)
+            if cur and cur["number"] == number:
+                cur["ts"] = time.time()
+                return cur
+            if cur and cur["number"] > number:
+                return cur
+            cur = {"number": number, "baseFee": base_fee, "gasPrice": None, "ts": time.time()}
+            self.heads[k] = cur
+            return cur
+
+    def head(self, w3: Web3) -> Dict[str,Any]:
+        k = self.key(w3)
+        cur = self.fresh(k)
+        if cur: return cur
+        with self.refresh_lock:
+            cur = self.fresh(k)
+            if cur: return cur
+            blk = w3.eth.get_block("latest")
+            base = blk.get("baseFeePerGas")
+            return self.update(k, int(blk["number"]), int(base) if base is not None else None)
+
+    def supports_1559(self, w3: Web3) -> bool:
+        k = self.key(w3)
+        if k not in self.eip1559:
+            self.head(w3)
+        return self.eip1559.get(k, False)
+
+    def fees(self, w3: Web3, priority_gwei: int) -> Dict[str,int]:
+        cur = self.head(w3)
+        if self.supports_1559(w3) and cur["baseFee"] is not None:
+            prio = gwei(priority_gwei)
+            return {"maxFeePerGas": cur["baseFee"]*2 + prio, "maxPriorityFeePerGas": prio}
+        if cur["gasPrice"] is None:
+            cur["gasPrice"] = int(w3.eth.gas_price)
+        return {"gasPrice": cur["gasPrice"]}
+
+FEES = FeeCache()
+
 def eip1559_supported(w3: Web3) -> bool:
     try:
-        blk = w3.eth.get_block("latest")
-        return "baseFeePerGas" in blk and blk["baseFeePerGas"] is not None
+        return FEES.supports_1559(w3)
     except Exception:
         return False
 
 def suggest_fees(w3: Web3, priority_gwei: int = MAX_PRIORITY_GWEI) -> Dict[str,int]:
-    if eip1559_supported(w3):
-        base = int(w3.eth.get_block("latest").get("baseFeePerGas", w3.eth.gas_price))
-        prio = gwei(priority_gwei)
-        return {"maxFeePerGas": base*2 + prio, "maxPriorityFeePerGas": prio}
-    return {"gasPrice": int(w3.eth.gas_price)}
+    try:
+        return FEES.fees(w3, priority_gwei)
+    except Exception:
+        return {"gasPrice": int(w3.eth.gas_price)}
+
+class NonceManager:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next_nonce: Dict[str,int] = {}
+        self.gaps: Dict[str,set] = {}
+        self.reserved: Dict[str,Dict[int,float]] = {}
+
+    def sync(self, w3: Web3, addr: str) -> int:
+        n = int(w3.eth.get_transaction_count(to_checksum_address(addr), "pending"))
+        with self.lock:
+            k = addr.lower()
+            self.next_nonce[k] = n; self.gaps[k] = set(); self.reserved[k] = {}
+        return n
+
+    def invalidate(self, addr: str):
+        with self.lock:
+            k = addr.lower()
+            self.next_nonce.pop(k, None); self.gaps.pop(k, None); self.reserved.pop(k, None)
+
+    def reserve(self, w3: Web3, addr: str) -> int:
+        return self.reserve_many(w3, addr, 1)[0]
+
+    def reserve_many(self, w3: Web3, addr: str, count: int) -> List[int]:
+        k = addr.lower()
+        if k not in self.next_nonce:
+            self.sync(w3, addr)
+        with self.lock:
+            now = time.time()
+            res = self.reserved.setdefault(k, {}); gaps = self.gaps.setdefault(k, set())
+            for n, t in list(res.items()):
+                if now - t > NONCE_RESERVE_TTL:
+                    del res[n]; gaps.add(n)
+            out = []
+            for _ in range(count):
+                if gaps:
+                    n = min(gaps); gaps.discard(n)
+                else:
+                    n = self.next_nonce[k]; self.next_nonce[k] = n + 1
+                res[n] = now; out.append(n)
+            return out
+
+    def confirm(self, addr: str, nonce: int):
+        with self.lock:
+            self.reserved.get(addr.lower(), {}).pop(int(nonce), None)
+
+    def release(self, addr: str, nonce: int):
+        with self.lock:
+            k = addr.lower(); nonce = int(nonce)
+            self.reserved.get(k, {}).pop(nonce, None)
+            if k not in self.next_nonce or nonce >= self.next_nonce[k]:
+                return
+            gaps = self.gaps.setdefault(k, set()); gaps.add(nonce)
+            while self.next_nonce[k]-1 in gaps:
+                self.next_nonce[k] -= 1; gaps.discard(self.next_nonce[k])
+
+NONCES = NonceManager()
+DEFER_NONCE: contextvars.ContextVar[bool] = contextvars.ContextVar("DEFER_NONCE", default=False)
+
+def is_nonce_error(e: Exception) -> bool:
+    msg = str(e).lower()
+    return any(x in msg for x in NONCE_RESYNC_ERRORS)
 
 def build_tx_common(w3: Web3, sender: str, bump=False) -> Dict[str,Any]:
+    t0 = time.perf_counter()
     fees = suggest_fees(w3)
     if bump and "gasPrice" in fees:
         fees["gasPrice"] = int(fees["gasPrice"]*(1+FEE_BUMP_PCT))
     if bump and "maxFeePerGas" in fees:
         fees["maxFeePerGas"] = int(fees["maxFeePerGas"]*(1+FEE_BUMP_PCT))
-    return {"from": sender, "nonce": w3.eth.get_transaction_count(sender, "pending"), "chainId": CHAIN_ID, **fees}
+    tx = {"from": sender, "chainId": CHAIN_ID, **fees}
+    if not DEFER_NONCE.get(): tx["nonce"] = NONCES.reserve(w3, sender)
+    METRICS.observe("tx_stage_seconds", time.perf_counter() - t0, stage="build")
+    return tx
+
+def bump_fees(w3: Web3, tx: Dict[str,Any]) -> Dict[str,Any]:
+    cur = suggest_fees(w3)
+    out = dict(tx)
+    for k in ("maxFeePerGas","maxPriorityFeePerGas","gasPrice"):
+        if k in tx:
+            out[k] = max(int(tx[k]*(1+FEE_BUMP_PCT)) + 1, int(cur.get(k, 0)))
+    if "maxFeePerGas" in out:
+        out["maxFeePerGas"] = max(out["maxFeePerGas"], out.get("maxPriorityFeePerGas", 0))
+    return out
+
+def head_number(w3: Web3) -> Optional[int]:
+    try:
+        return int(FEES.head(w3)["number"])
+    except Exception:
+        return None
+
+_RPC_IDS = itertools.count(1)
+RECEIPT_INT_FIELDS = ("status","blockNumber","gasUsed","cumulativeGasUsed","effectiveGasPrice","transactionIndex","type")
+
+def provider_key(w3: Web3) -> str:
+    kw = getattr(w3.provider, "_request_kwargs", None) or {}
+    return f"{getattr(w3.provider, 'endpoint_uri', id(w3.provider))}|{kw.get('proxies')}"
+
+def rpc_batch(w3: Web3, calls: List[Tuple[str, list]]) -> List[Any]:
+    if not calls:
+        return []
+    prov = w3.provider
+    payload = [{"jsonrpc":"2.0","id":next(_RPC_IDS),"method":m,"params":p} for m, p in calls]
+    data = None
+    if getattr(prov, "endpoint_uri", None) and hasattr(prov, "get_request_kwargs"):
+        kwargs = dict(prov.get_request_kwargs()); body = json.dumps(payload)
+        def post(url: str):
+            out = post_rpc(url, body, kwargs)
+            for d in (out if isinstance(out, list) else [out]):
+                if rpc_throttled(d): raise RpcThrottled(str(d.get("error")))
+            return out
+        urls = ENDPOINTS.order(prov.endpoint_uri)
+        fn = (lambda u: ENDPOINTS.hedged(post, u, urls)) if all(m in HEDGE_METHODS for m, _ in calls) else post
+        data = rpc_guarded("batch", fn, urls, idempotent=not any(m in NON_IDEMPOTENT_METHODS for m, _ in calls))
+        for m, _ in calls: METRICS.inc("rpc_calls_total", method=m)
+    if not isinstance(data, list):
+        data = [{"id": req["id"], **prov.make_request(req["method"], req["params"])} for req in payload]
+    by_id = {d.get("id"): d for d in data}
+    out = []
+    for req in payload:
+        d = by_id.get(req["id"]) or {"error": "no response"}
+        if d.get("error") is not None: METRICS.inc("rpc_errors_total", method=req["method"])
+        out.append(RuntimeError(d["error"]) if d.get("error") is not None else d.get("result"))
+    return out
+
+def format_receipt(r: Dict[str,Any]) -> AttributeDict:
+    return AttributeDict({k: (int(v, 16) if k in RECEIPT_INT_FIELDS and isinstance(v, str) else v) for k, v in r.items()})
+
+class ReceiptTracker:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pending: Dict[str,List[Any]] = {}
+        self.thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def norm(tx_hash) -> str:
+        hx = (tx_hash if isinstance(tx_hash, str) else bytes(tx_hash).hex()).lower()
+        return hx if hx.startswith("0x") else "0x"+hx
+
+    def submit(self, w3: Web3, tx_hash, kind: str = "tx") -> Future:
+        hx = self.norm(tx_hash)
+        with self.lock:
+            if hx in self.pending:
+                return self.pending[hx][1]
+            fut = Future()
+            self.pending[hx] = [w3, fut, time.time(), False, kind, False]
+            if not self.thread or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="receipt-tracker", daemon=True)
+                self.thread.start()
+        return fut
+
+    def forget(self, tx_hash):
+        with self.lock:
+            self.pending.pop(self.norm(tx_hash), None)
+
+    def poll_now(self):
+        self.wake.set()
+
+    def stop(self):
+        with self.lock:
+            items, self.pending = list(self.pending.values()), {}
+        for e in items:
+            if not e[1].done(): e[1].set_exception(RunStopped())
+
+    def poll(self):
+        with self.lock:
+            items = list(self.pending.items())
+        groups: Dict[str,List[Tuple[str,List[Any]]]] = {}
+        for hx, entry in items:
+            groups.setdefault(provider_key(entry[0]), []).append((hx, entry))
+        for entries in groups.values():
+            unseen = [(hx, e) for hx, e in entries if not e[3] and not e[5]]
+            try:
+                res = rpc_batch(entries[0][1][0], [("eth_getTransactionReceipt", [hx]) for hx, _ in entries] + [("eth_getTransactionByHash", [hx]) for hx, _ in unseen])
+            except Exception:
+                continue
+            now = time.time()
+            for (hx, e), r in zip(unseen, res[len(entries):]):
+                e[5] = True
+                if r and not isinstance(r, Exception):
+                    e[3] = True; METRICS.observe("tx_stage_seconds", now - e[2], stage="first_seen", kind=e[4])
+            for (hx, e), r in zip(entries, res):
+                _, fut, ts, seen, kind, _ = e
+                if r is None or isinstance(r, Exception):
+                    if now - ts > WAIT_TIMEOUT_SECS:
+                        self.forget(hx)
+                        if not fut.done(): fut.set_exception(FutureTimeout(f"receipt {hx} belum ada setelah {WAIT_TIMEOUT_SECS}s"))
+                    continue
+                self.forget(hx)
+                if not seen: METRICS.observe("tx_stage_seconds", now - ts, stage="first_seen", kind=kind)
+                METRICS.observe("tx_stage_seconds", now - ts, stage="mined", kind=kind)
+                if not fut.done(): fut.set_result(format_receipt(r))
+
+    def run(self):
+        while True:
+            self.wake.wait(max(self.interval, HEADS.stale_secs) if HEADS.live else self.interval); self.wake.clear()
+            if self.pending:
+                self.poll()
+
+TRACKER = ReceiptTracker(RECEIPT_POLL_SECS)
+
+class HeadStream:
+    def __init__(self, url: str, key: str):
+        self.url = url
+        self.key = key
+        self.stale_secs = max(1.0, WS_STALE_BLOCKS * BLOCK_INTERVAL_SECS)
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.live = False
+
+    def start(self):
+        if not self.url or self.thread:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="ws-heads", daemon=True); self.thread.start()
+
+    def on_head(self, head: Dict[str,Any]):
+        number = int(head["number"], 16)
+        base = head.get("baseFeePerGas")
+        FEES.update(self.key, number, int(base, 16) if base else None)
+        METRICS.inc("ws_heads_total"); METRICS.set("ws_head", number)
+        TRACKER.poll_now()
+
+    def listen(self, connect):
+        with connect(self.url, open_timeout=10, close_timeout=2, max_size=2**22) as ws:
+            ws.send(json.dumps({"jsonrpc":"2.0","id":1,"method":"eth_subscribe","params":["newHeads"]}))
+            ack = json.loads(ws.recv(timeout=10))
+            if ack.get("error") is not None or not ack.get("result"):
+                raise RuntimeError(f"eth_subscribe ditolak: {ack.get('error')}")
+            self.live = True; METRICS.set("ws_connected", 1)
+            console.print(f"[muted]WebSocket newHeads aktif ({endpoint_label(self.url)})[/muted]")
+            while True:
+                msg = json.loads(ws.recv(timeout=self.stale_secs))
+                if msg.get("method") == "eth_subscription":
+                    self.on_head(msg["params"]["result"])
+
+    def run(self):
+        try:
+            from websockets.sync.client import connect
+        except Exception as e:
+            console.print(f"[warn]RPC_WS_URL diabaikan, modul websockets tidak tersedia ({e}) • tetap HTTP polling[/warn]")
+            return
+        backoff = 1.0
+        while True:
+            t0 = time.time()
+            try:
+                self.listen(connect)
+            except Exception as e:
+                if self.live or backoff == 1.0:
+                    console.print(f"[warn]WebSocket terputus ({e or type(e).__name__}) • kembali ke HTTP polling[/warn]")
+            self.live = False; METRICS.set("ws_connected", 0)
+            TRACKER.poll_now()
+            backoff = 1.0 if time.time() - t0 > 60 else min(30.0, backoff * 2)
+            time.sleep(backoff)
+
+HEADS = HeadStream(RPC_WS_URL, RPC_URL)
+
+class GasProfiles:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.samples: Optional[Dict[str,deque]] = None
+        self.saved_at = time.time()
+
+    def key(self, tx: Dict[str,Any]) -> str:
+        data = tx.get("data") or "0x"
+        data = data if isinstance(data, str) else Web3.to_hex(data)
+        return f"{CHAIN_ID}:{str(tx.get('to','')).lower()}:{data[:10].lower()}"
+
+    def load(self) -> Dict[str,deque]:
+        with self.lock:
+            if self.samples is None:
+                try:
+                    raw = json.loads(Path(self.path).read_text()) if Path(self.path).exists() else {}
+                except Exception:
+                    raw = {}
+                self.samples = {k: deque((int(x) for x in v), maxlen=GAS_PROFILE_WINDOW) for k, v in raw.items()}
+            return self.samples
+
+    def save(self):
+        with self.lock:
+            if self.samples is None:
+                return
+            tmp = Path(self.path + ".tmp")
+            tmp.write_text(json.dumps({k: list(v) for k, v in self.samples.items()}, sort_keys=True))
+            os.replace(tmp, self.path)
+            self.saved_at = time.time()
+
+    def limit(self, tx: Dict[str,Any]) -> Optional[int]:
+        samples = self.load().get(self.key(tx))
+        if not samples or len(samples) < GAS_PROFILE_MIN_SAMPLES:
+            return None
+        xs = sorted(samples)
+        high = xs[min(len(xs)-1, int(math.ceil(GAS_PROFILE_PCT * len(xs))) - 1)]
+        return int(math.ceil(high * (1 + GAS_PROFILE_MARGIN)))
+
+    def record(self, tx: Dict[str,Any], gas_used: int):
+        samples = self.load()
+        with self.lock:
+            samples.setdefault(self.key(tx), deque(maxlen=GAS_PROFILE_WINDOW)).append(int(gas_used))
+        if time.time() - self.saved_at > 30:
+            self.save()
+
+    def reset(self, tx: Dict[str,Any]):
+        samples = self.load()
+        with self.lock:
+            samples.pop(self.key(tx), None)
+
+GAS_PROFILES = GasProfiles(GAS_PROFILES_PATH)
+atexit.register(GAS_PROFILES.save)
+
+KNOWN_ERRORS = {"0x" + keccak(text=sig)[:4].hex(): sig for sig in REVERT_SIGNATURES}
+
+def tx_call_params(tx: Dict[str,Any]) -> Dict[str,Any]:
+    p = {k: tx[k] for k in ("from","to") if tx.get(k)}
+    data = tx.get("data") or "0x"
+    p["data"] = data if isinstance(data, str) else Web3.to_hex(data)
+    for k in ("value","gas"):
+        if tx.get(k): p[k] = hex(int(tx[k]))
+    return p
+
+def simulate_calls(tx: Dict[str,Any], estimate=False) -> List[Tuple[str, list]]:
+    p = tx_call_params(tx)
+    return [("eth_call", [p, "pending"])] + ([("eth_estimateGas", [p])] if estimate else [])
+
+def revert_reason(err: Any) -> Optional[str]:
+    if not isinstance(err, Exception):
+        return None
+    e = err.args[0] if err.args and isinstance(err.args[0], dict) else {"message": str(err), "data": getattr(err, "data", None)}
+    msg, data = str(e.get("message") or ""), e.get("data")
+    if isinstance(data, dict): data = data.get("data") or data.get("result")
+    if isinstance(data, (bytes, bytearray)): data = Web3.to_hex(data)
+    data = data if isinstance(data, str) and data.startswith("0x") and len(data) >= 10 else None
+    if data is None and "revert" not in msg.lower() and e.get("code") != 3:
+        return None
+    if data is None:
+        return msg.split("reverted:", 1)[-1].strip() if "reverted:" in msg else "execution reverted"
+    sel, body = data[:10].lower(), bytes.fromhex(data[10:])
+    try:
+        if sel == ERROR_SELECTOR:
+            return abi_decode(["string"], body)[0] or "Error()"
+        if sel == PANIC_SELECTOR:
+            c = abi_decode(["uint256"], body)[0]
+            return f"Panic(0x{c:02x}{': ' + PANIC_CODES[c] if c in PANIC_CODES else ''})"
+        if sel in KNOWN_ERRORS:
+            sig = KNOWN_ERRORS[sel]; name, types = sig[:sig.index("(")], [t for t in sig[sig.index("(")+1:-1].split(",") if t]
+            return f"{name}({', '.join(str(v) for v in abi_decode(types, body))})"
+    except Exception:
+        pass
+    return f"custom error {sel}" + (f" ({len(body)} bytes)" if body else "")
+
+class RevertCache:
+    def __init__(self, ttl: int, min_hits: int):
+        self.ttl = ttl
+        self.min_hits = max(1, min_hits)
+        self.lock = threading.Lock()
+        self.entries: Dict[Tuple[str,...],List[Any]] = {}
+
+    @staticmethod
+    def key(tx: Dict[str,Any], shared=True) -> Tuple[str,...]:
+        data = tx.get("data") or "0x"
+        data = data if isinstance(data, str) else Web3.to_hex(data)
+        k = (str(tx.get("to","")).lower(), data[:10].lower())
+        return k if shared else k + (str(tx.get("from","")).lower(),)
+
+    @staticmethod
+    def shared(reason: str) -> bool:
+        return any(h in reason.lower() for h in REVERT_SHARED_HINTS)
+
+    def get(self, tx: Dict[str,Any]) -> Optional[str]:
+        with self.lock:
+            for k in (self.key(tx), self.key(tx, False)):
+                e = self.entries.get(k)
+                if e and time.time() - e[2] > self.ttl:
+                    del self.entries[k]; continue
+                if e and e[1] >= self.min_hits: return e[0]
+            return None
+
+    def add(self, tx: Dict[str,Any], reason: str):
+        shared = self.shared(reason)
+        k = self.key(tx, shared)
+        with self.lock:
+            e = self.entries.get(k)
+            if not e or e[0] != reason or time.time() - e[2] > self.ttl:
+                e = self.entries[k] = [reason, 0, 0.0, set()]
+            sender = str(tx.get("from","")).lower()
+            if not shared or sender not in e[3]: e[1] += 1; e[3].add(sender)
+            e[2] = time.time()
+
+    def clear(self, tx: Dict[str,Any]):
+        with self.lock:
+            self.entries.pop(self.key(tx), None); self.entries.pop(self.key(tx, False), None)
+
+REVERTS = RevertCache(REVERT_CACHE_TTL, REVERT_CACHE_MIN_HITS)
+
+RUN_CTX: contextvars.ContextVar[Optional[Dict[str,Any]]] = contextvars.ContextVar("RUN_CTX", default=None)
+
+class RunJournal:
+    def __init__(self, path: str, fsync_secs: float):
+        self.path = path
+        self.fsync_secs = fsync_secs
+        self.lock = threading.Lock()
+        self.buf: List[str] = []
+        self.thread: Optional[threading.Thread] = None
+        self.cycle = 0
+        self.scope: Optional[str] = None
+        self.open = False
+        self.ended_at: Optional[float] = None
+        self.steps: set = set()
+        self.progs: set = set()
+        self.pending: Dict[str,Dict[str,Any]] = {}
+
+    def apply(self, r: Dict[str,Any]):
+        ev = r.get("ev")
+        if ev == "cycle":
+            if r.get("state") == "start":
+                self.cycle = int(r["cycle"]); self.scope = r.get("scope"); self.open = True; self.ended_at = None
+                self.steps.clear(); self.progs.clear(); self.pending.clear()
+            else:
+                self.open = False; self.ended_at = float(r["t"])
+        elif ev == "step":
+            self.steps.add((r["acct"], r["prog"], r["step"]))
+        elif ev == "prog":
+            self.progs.add((r["acct"], r["prog"]))
+        elif ev == "tx":
+            if r["status"] == "sent":
+                self.pending[r["hash"]] = r
+            else:
+                p = self.pending.pop(r["hash"], None)
+                if p and r["status"] == "mined" and p.get("kind") == "action":
+                    self.steps.add((p["acct"], p["prog"], p["step"]))
+
+    def load(self):
+        if not Path(self.path).exists():
+            return
+        with open(self.path) as f:
+            for line in f:
+                try: self.apply(json.loads(line))
+                except Exception: pass
+
+    def write(self, **rec):
+        rec = {"t": round(time.time(), 3), **rec}
+        with self.lock:
+            self.apply(rec); self.buf.append(json.dumps(rec, separators=(",",":")))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="journal", daemon=True); self.thread.start()
+
+    def flush(self):
+        with self.lock:
+            lines, self.buf = self.buf, []
+        if lines:
+            with open(self.path, "a") as f:
+                f.write("\n".join(lines) + "\n"); f.flush(); os.fsync(f.fileno())
+
+    def run(self):
+        while True:
+            time.sleep(self.fsync_secs)
+            try: self.flush()
+            except Exception as e: console.print(f"[warn]Journal gagal ditulis: {e}[/warn]")
+
+    def done(self, acct: str, prog: str, step: Optional[str] = None) -> bool:
+        return (acct, prog) in self.progs if step is None else (acct, prog, step) in self.steps
+
+    def begin_cycle(self, scope: str) -> int:
+        if self.open and self.scope == scope:
+            console.print(f"[accent]Melanjutkan siklus {self.cycle} dari journal • {len(self.progs)} program & {len(self.steps)} langkah sudah selesai[/accent]")
+            return self.cycle
+        if self.open:
+            console.print(f"[warn]Siklus {self.cycle} di journal memakai program/akun lain, mulai siklus baru[/warn]")
+        with self.lock:
+            self.buf = []
+            Path(self.path).write_text("")
+        self.write(ev="cycle", cycle=self.cycle + 1, state="start", scope=scope)
+        return self.cycle
+
+    def end_cycle(self):
+        self.write(ev="cycle", cycle=self.cycle, state="end"); self.flush()
+
+    def reconcile(self, w3: Web3) -> int:
+        hashes = list(self.pending)
+        if not hashes:
+            return 0
+        res = rpc_batch(w3, [("eth_getTransactionReceipt", [h]) for h in hashes])
+        for h, r in zip(hashes, res):
+            if isinstance(r, Exception):
+                continue
+            status = "unknown" if not isinstance(r, dict) else ("mined" if int(r.get("status","0x0"), 16) == 1 else "reverted")
+            self.write(ev="tx", hash=h, status=status)
+        self.flush()
+        return len(hashes)
+
+JOURNAL = RunJournal(JOURNAL_PATH, JOURNAL_FSYNC_SECS)
+atexit.register(JOURNAL.flush)
+
+def journal_tx(hx: str, status: str, label: str = ""):
+    ctx = RUN_CTX.get()
+    if ctx is None:
+        return
+    if status == "sent":
+        kind = "prep" if label.lower().startswith(JOURNAL_PREP_LABELS) else "action"
+        JOURNAL.write(ev="tx", cycle=ctx["cycle"], acct=ctx["acct"], prog=ctx["prog"], step=ctx.get("step"), hash=hx, status=status, kind=kind)
+    else:
+        JOURNAL.write(ev="tx", hash=hx, status=status)
+
+def step_todo(step: str) -> bool:
+    ctx = RUN_CTX.get()
+    if ctx is None:
+        return True
+    ctx["step"] = step
+    if JOURNAL.done(ctx["acct"], ctx["prog"], step):
+        console.print(f"[muted]{ctx['prog']} {step}: sudah selesai (journal), dilewati[/muted]")
+        return False
+    return True
+
+def step_done(step: Optional[str] = None):
+    ctx = RUN_CTX.get()
+    if ctx is not None and step: ctx["step"] = step
+    if ctx is not None and ctx.get("step"):
+        JOURNAL.write(ev="step", cycle=ctx["cycle"], acct=ctx["acct"], prog=ctx["prog"], step=ctx["step"])
+
+def sign_raw(w3: Web3, tx: Dict[str,Any], pk: str, kind: str) -> bytes:
+    t0 = time.perf_counter()
+    signed = w3.eth.account.sign_transaction(tx, private_key=pk)
+    METRICS.observe("tx_stage_seconds", time.perf_counter() - t0, stage="sign", kind=kind)
+    return getattr(signed,"rawTransaction",None) or getattr(signed,"raw_transaction",None)
+
+def send_raw(w3: Web3, tx: Dict[str,Any], pk: str, kind: str):
+    raw = sign_raw(w3, tx, pk, kind)
+    t0 = time.perf_counter()
+    h = w3.eth.send_raw_transaction(raw)
+    METRICS.observe("tx_stage_seconds", time.perf_counter() - t0, stage="send", kind=kind)
+    return h
 
 def sign_send_wait(w3: Web3, tx: Dict[str,Any], pk: str, label="TX", gas_fallback=250_000) -> Tuple[bool, Optional[str]]:
-    if "gas" not in tx:
+    learned = GAS_PROFILES.limit(tx)
+    sender = tx.get("from") or w3.eth.account.from_key(pk).address
+    kind = tx_kind(label)
+    if "nonce" not in tx: tx["nonce"] = NONCES.reserve(w3, sender)
+    if SIMULATE_ENABLED:
+        reason, status = REVERTS.get(tx), "skipped_cached"
+        if reason is None:
+            t0 = time.perf_counter()
+            try:
+                res = rpc_batch(w3, simulate_calls(tx, estimate=not learned and "gas" not in tx))
+            except Exception:
+                res = [None]
+            METRICS.observe("tx_stage_seconds", time.perf_counter() - t0, stage="simulate", kind=kind)
+            reason, status = revert_reason(res[0]), "simulated_revert"
+            if reason is not None:
+                REVERTS.add(tx, reason)
+            elif len(res) > 1 and isinstance(res[1], str):
+                tx["gas"] = int(int(res[1], 16)*1.2)
+        if reason is not None:
+            NONCES.release(sender, tx["nonce"])
+            METRICS.inc("tx_total", kind=kind, status=status)
+            console.print(f"[warn]{label} dilewati: simulasi revert ({reason}){' • cache' if status == 'skipped_cached' else ''}[/warn]", fields={"ev":"tx","label":label,"status":status,"nonce":tx["nonce"],"reason":reason})
+            return False, None
+    if learned:
+        tx["gas"] = learned
+    elif "gas" not in tx:
         try:
             est = w3.eth.estimate_gas(dict(tx))
             tx["gas"] = int(est*1.2)
         except Exception:
             tx["gas"] = gas_fallback
-    signed = w3.eth.account.sign_transaction(tx, private_key=pk)
-    raw = getattr(signed,"rawTransaction",None) or getattr(signed,"raw_transaction",None)
-    try:
-        h = w3.eth.send_raw_transaction(raw)
-    except Exception as e:
-        console.print(f"[err]{label} gagal dikirim: {e}[/err]")
-        return False, None
+    for attempt in (1, 2):
+        try:
+            h = send_raw(w3, tx, pk, kind)
+            NONCES.confirm(sender, tx["nonce"])
+            break
+        except Exception as e:
+            if attempt == 1 and is_nonce_error(e):
+                console.print(f"[warn]{label}: nonce usang, sinkron ulang ({e})[/warn]")
+                NONCES.invalidate(sender)
+                try:
+                    tx["nonce"] = NONCES.reserve(w3, sender)
+                    continue
+                except Exception as e2:
+                    e = e2
+            NONCES.release(sender, tx["nonce"])
+            METRICS.inc("tx_total", kind=kind, status="send_failed")
+            console.print(f"[err]{label} gagal dikirim: {e}[/err]", fields={"ev":"tx","label":label,"status":"send_failed","nonce":tx["nonce"],"error":str(e)})
+            return False, None
     hx = h.hex()
-    console.print(f"[muted]Sent {label}[/muted]: {hx}")
+    console.print(f"[muted]Sent {label}[/muted]: {hx}", fields={"ev":"tx","label":label,"status":"sent","hash":hx,"nonce":tx["nonce"],"gas":tx["gas"]})
+    journal_tx(hx, "sent", label)
+    rcpt, hx, tx, retries, err = await_tx(w3, tx, pk, label, sender, {hx: TRACKER.submit(w3, h, kind)})
+    return settle_tx(tx, label, sender, rcpt, hx, retries, err, learned)
+
+def await_tx(w3: Web3, tx: Dict[str,Any], pk: str, label: str, sender: str, futs: Dict[str,Future]) -> Tuple[Optional[AttributeDict], str, Dict[str,Any], int, Optional[Exception]]:
+    kind = tx_kind(label)
+    hx = list(futs)[-1]
+    deadline = time.time() + WAIT_TIMEOUT_SECS
+    window = REPLACE_AFTER_BLOCKS * BLOCK_INTERVAL_SECS
+    sent_at, sent_block, retries, rcpt, err = time.time(), head_number(w3), 0, None, None
+    while rcpt is None and futs and time.time() < deadline:
+        if STOP.is_set() and RUN_CTX.get() is not None:
+            for k in futs: TRACKER.forget(k)
+            raise RunStopped()
+        left = deadline - time.time()
+        done, _ = futures_wait(list(futs.values()), timeout=min(left, max(BLOCK_INTERVAL_SECS, window - (time.time() - sent_at))) if window > 0 else left, return_when=FIRST_COMPLETED)
+        for k, f in list(futs.items()):
+            if f not in done: continue
+            try: rcpt, hx = f.result(), k; break
+            except Exception as e: err = e; futs.pop(k); TRACKER.forget(k)
+        if rcpt is not None or window <= 0 or time.time() - sent_at < window:
+            continue
+        head = head_number(w3)
+        if head is not None and sent_block is not None and head - sent_block < REPLACE_AFTER_BLOCKS:
+            continue
+        if retries >= MAX_RETRIES_PER_TX:
+            break
+        retries += 1; sent_at, sent_block = time.time(), head
+        new = bump_fees(w3, tx)
+        try:
+            h2 = send_raw(w3, new, pk, kind)
+        except Exception as e:
+            if "nonce too low" in str(e).lower(): retries = MAX_RETRIES_PER_TX
+            console.print(f"[warn]{label}: ganti fee #{retries} gagal ({e})[/warn]")
+            continue
+        tx, prev, hx = new, hx, h2.hex()
+        futs[hx] = TRACKER.submit(w3, h2, kind)
+        journal_tx(hx, "sent", label)
+        METRICS.inc("tx_replaced_total", kind=kind)
+        fees = {k: tx[k] for k in ("maxFeePerGas","maxPriorityFeePerGas","gasPrice") if k in tx}
+        console.print(f"[warn]{label} belum mined {REPLACE_AFTER_BLOCKS} blok, ganti fee #{retries}/{MAX_RETRIES_PER_TX}[/warn]: {hx}", fields={"ev":"tx","label":label,"status":"replaced","hash":hx,"replaces":prev,"nonce":tx["nonce"],"retry":retries,**fees})
+    for k in futs:
+        if rcpt is None or k != hx:
+            TRACKER.forget(k)
+            if rcpt is not None: journal_tx(k, "replaced")
+    if rcpt is None and futs and window > 0:
+        send_cancel(w3, tx, pk, label, sender, hx, f"tidak mined setelah {retries}x ganti fee")
+    return rcpt, hx, tx, retries, err
+
+def send_cancel(w3: Web3, tx: Dict[str,Any], pk: str, label: str, sender: str, hx: str, why: str) -> Optional[Tuple[Dict[str,Any], str, Any]]:
+    cancel = {**bump_fees(w3, tx), "to": sender, "value": 0, "data": "0x", "gas": 21_000}
     try:
-        rcpt = w3.eth.wait_for_transaction_receipt(h, timeout=WAIT_TIMEOUT_SECS)
+        hc = send_raw(w3, cancel, pk, "cancel")
     except Exception as e:
-        console.print(f"[err]wait_for_receipt: {e}[/err]")
+        console.print(f"[warn]{label}: pembatalan gagal ({e})[/warn]"); return None
+    chx = hc.hex(); journal_tx(chx, "sent", f"cancel {label}")
+    console.print(f"[warn]Batalkan {label} ({why})[/warn]: {chx}", fields={"ev":"tx","label":label,"status":"cancel_sent","hash":chx,"replaces":hx,"nonce":tx["nonce"]})
+    return cancel, chx, hc
+
+def send_chain(w3: Web3, pk: str, items: List[Tuple[Dict[str,Any], str, Optional[str]]], dependent: bool = True) -> List[Tuple[bool, Optional[str]]]:
+    sender, ctx = items[0][0]["from"], RUN_CTX.get()
+    sent = []
+    for (tx, _, _), nonce in zip(items, NONCES.reserve_many(w3, sender, len(items))): tx["nonce"] = nonce
+    for n, (tx, label, step) in enumerate(items):
+        kind = tx_kind(label)
+        learned = GAS_PROFILES.limit(tx)
+        if learned: tx["gas"] = learned
+        try:
+            h = send_raw(w3, tx, pk, kind)
+            NONCES.confirm(sender, tx["nonce"])
+        except Exception as e:
+            METRICS.inc("tx_total", kind=kind, status="send_failed")
+            console.print(f"[err]{label} gagal dikirim: {e}[/err]", fields={"ev":"tx","label":label,"status":"send_failed","nonce":tx["nonce"],"error":str(e)})
+            for t, _, _ in reversed(items[n:]): NONCES.release(sender, t["nonce"])
+            if is_nonce_error(e): NONCES.invalidate(sender)
+            break
+        hx = h.hex()
+        if ctx is not None and step: ctx["step"] = step
+        console.print(f"[muted]Sent {label}[/muted] • pipeline {n+1}/{len(items)}: {hx}", fields={"ev":"tx","label":label,"status":"sent","hash":hx,"nonce":tx["nonce"],"gas":tx["gas"],"pipeline":n+1})
+        journal_tx(hx, "sent", label)
+        sent.append((tx, label, step, learned, hx, TRACKER.submit(w3, h, kind)))
+    METRICS.inc("pipeline_txs_total", len(sent))
+    out: List[Tuple[bool, Optional[str]]] = []
+    broken: Optional[str] = None
+    for tx, label, step, learned, hx, fut in sent:
+        if ctx is not None and step: ctx["step"] = step
+        if broken == "timeout":
+            TRACKER.forget(hx); journal_tx(hx, "dropped"); METRICS.inc("tx_total", kind=tx_kind(label), status="dropped")
+            console.print(f"[warn]{label} ditinggalkan: tx sebelumnya tidak mined[/warn]", fields={"ev":"tx","label":label,"status":"dropped","hash":hx,"nonce":tx["nonce"]})
+            out.append((False, hx)); continue
+        futs, cancel = {hx: fut}, None
+        if broken and not fut.done():
+            sent_cancel = send_cancel(w3, tx, pk, label, sender, hx, "tx sebelumnya gagal")
+            if sent_cancel:
+                cancel, chx, hc = sent_cancel; futs[chx] = TRACKER.submit(w3, hc, "cancel")
+        rcpt, rhx, rtx, retries, err = await_tx(w3, cancel or tx, pk, label, sender, futs)
+        if cancel and rcpt is not None and rhx != hx:
+            journal_tx(rhx, "mined"); METRICS.inc("tx_total", kind=tx_kind(label), status="cancelled")
+            console.print(f"[warn]{label} dibatalkan[/warn] • block={rcpt.blockNumber}", fields={"ev":"tx","label":label,"status":"cancelled","hash":rhx,"replaces":hx,"block":rcpt.blockNumber})
+            out.append((False, hx)); continue
+        ok, rhx = settle_tx(tx if cancel else rtx, label, sender, rcpt, rhx, retries, err, learned)
+        out.append((ok, rhx))
+        if not ok and broken is None and (dependent or rcpt is None):
+            broken = "timeout" if rcpt is None else "reverted"
+    return out + [(False, None)] * (len(items) - len(out))
+
+def settle_tx(tx: Dict[str,Any], label: str, sender: str, rcpt: Optional[AttributeDict], hx: str, retries: int, err: Optional[Exception], learned: Optional[int]) -> Tuple[bool, Optional[str]]:
+    kind = tx_kind(label)
+    if rcpt is None:
+        NONCES.invalidate(sender)
+        METRICS.inc("tx_total", kind=kind, status="timeout")
+        msg = err or (f"tidak mined dalam {(retries + 1) * REPLACE_AFTER_BLOCKS} blok ({retries}x ganti fee)" if REPLACE_AFTER_BLOCKS > 0 else f"receipt {hx} belum ada setelah {WAIT_TIMEOUT_SECS}s")
+        console.print(f"[err]wait_for_receipt: {msg}[/err]", fields={"ev":"tx","label":label,"status":"timeout","hash":hx,"retries":retries})
         return False, hx
+    journal_tx(hx, "mined" if rcpt.status == 1 else "reverted")
+    METRICS.inc("tx_total", kind=kind, status="mined" if rcpt.status == 1 else "reverted")
+    METRICS.inc("tx_gas_used_total", rcpt.gasUsed, kind=kind)
     if rcpt.status == 1:
-        console.print(f"[ok]{label} Mined[/ok] • block={rcpt.blockNumber} • gasUsed={rcpt.gasUsed}")
+        GAS_PROFILES.record(tx, rcpt.gasUsed)
+        REVERTS.clear(tx)
+        console.print(f"[ok]{label} Mined[/ok] • block={rcpt.blockNumber} • gasUsed={rcpt.gasUsed}", fields={"ev":"tx","label":label,"status":"mined","hash":hx,"block":rcpt.blockNumber,"gas_used":rcpt.gasUsed,"gas":tx["gas"]})
         return True, hx
-    console.print(f"[err]{label} Reverted[/err] • block={rcpt.blockNumber}")
+    if learned and rcpt.gasUsed >= tx["gas"] * 0.98:
+        GAS_PROFILES.reset(tx)
+    console.print(f"[err]{label} Reverted[/err] • block={rcpt.blockNumber}", fields={"ev":"tx","label":label,"status":"reverted","hash":hx,"block":rcpt.blockNumber,"gas_used":rcpt.gasUsed,"gas":tx["gas"]})
     return False, hx
 
+STOP = threading.Event()
+
+class RunStopped(BaseException):
+    pass
+
 def sleep_countdown(seconds: int, label="Jeda"):
     seconds = max(0, int(seconds))
     if seconds == 0:
         return
+    t0 = time.time()
+    try:
+        countdown(seconds, label)
+    finally:
+        METRICS.inc("sleep_seconds_total", time.time() - t0, label=label)
+
+def countdown(seconds: int, label: str):
+    if threading.current_thread() is not threading.main_thread():
+        if STOP.wait(seconds): raise RunStopped()
+        return
     with Progress(SpinnerColumn(style="accent"), TextColumn("[muted]{task.description}[/muted]"), BarColumn(bar_width=None), TimeRemainingColumn(), transient=True, console=console) as prog:
         t = prog.add_task(label, total=seconds)
         for _ in range(seconds):
@@ -196,19 +1258,229 @@ def sleep_countdown(seconds: int, label="Jeda"):
 def to_units(amount: Decimal|float|str, decimals: int) -> int:
     return int(Decimal(str(amount)).scaleb(decimals))
 
-def get_decimals(w3: Web3, token: str) -> int:
-    c = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    return int(c.functions.decimals().call())
+ViewCall = Tuple[str, str, tuple]
+
+class MulticallUnsupported(RuntimeError):
+    pass
+
+class Multicall:
+    def __init__(self):
+        self.available: Dict[str,bool] = {}
 
-def ensure_approval(w3: Web3, token: str, owner: str, spender: str, need: int, pk: str):
-    c = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    cur = int(c.functions.allowance(owner, to_checksum_address(spender)).call())
+    def aggregate3(self, w3: Web3, calls: List[ViewCall]) -> List[Any]:
+        payload = [(to_checksum_address(t), True, ERC20[fn].encode(*args)) for t, fn, args in calls]
+        raw = w3.eth.call({"to": to_checksum_address(MULTICALL3_ADDRESS), "data": Web3.to_hex(AGGREGATE3.encode(payload))})
+        if not raw:
+            raise MulticallUnsupported(f"multicall3: tidak ada kontrak di {MULTICALL3_ADDRESS}")
+        try:
+            res = AGGREGATE3.decode(raw)
+        except Exception as e:
+            raise MulticallUnsupported(f"multicall3: hasil tidak bisa di-decode ({e})")
+        if len(res) != len(calls):
+            raise MulticallUnsupported("multicall3: jumlah hasil tidak cocok")
+        out = []
+        for (t, fn, _), (ok, data) in zip(calls, res):
+            try:
+                if not ok: raise RuntimeError(f"{fn} revert @ {t}")
+                out.append(ERC20[fn].decode(data))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    def rpc(self, w3: Web3, calls: List[ViewCall]) -> List[Any]:
+        res = rpc_batch(w3, [("eth_call", [{"to": to_checksum_address(t), "data": Web3.to_hex(ERC20[fn].encode(*args))}, "latest"]) for t, fn, args in calls])
+        out = []
+        for (t, fn, _), r in zip(calls, res):
+            try:
+                if isinstance(r, Exception): raise r
+                out.append(ERC20[fn].decode(HexBytes(r)))
+            except Exception as e:
+                out.append(e)
+        return out
+
+    def call(self, w3: Web3, calls: List[ViewCall]) -> List[Any]:
+        out: List[Any] = []
+        k = provider_key(w3)
+        for i in range(0, len(calls), MULTICALL_CHUNK):
+            chunk = calls[i:i+MULTICALL_CHUNK]
+            if self.available.get(k, True):
+                try:
+                    out.extend(self.aggregate3(w3, chunk)); self.available[k] = True
+                    continue
+                except MulticallUnsupported:
+                    self.available[k] = False
+                except Exception:
+                    pass
+            out.extend(self.rpc(w3, chunk))
+        return out
+
+MULTICALL = Multicall()
+
+def call_view(w3: Web3, to: str, fn: FnCodec, *args) -> Any:
+    return fn.decode(w3.eth.call({"to": to_checksum_address(to), "data": Web3.to_hex(fn.encode(*args))}))
+
+def erc20_view(w3: Web3, token: str, fn: str, *args) -> Any:
+    return call_view(w3, token, ERC20[fn], *args)
+
+def contract_tx(w3: Web3, sender: str, to: str, data: bytes, gas: Optional[int] = None, value: int = 0) -> Dict[str,Any]:
+    tx = {"to": to_checksum_address(to), **build_tx_common(w3, sender), "data": Web3.to_hex(data), "value": int(value)}
+    if gas is not None: tx["gas"] = int(gas)
+    return tx
+
+class TokenMetaCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.meta: Optional[Dict[str,Dict[str,Any]]] = None
+
+    def key(self, token: str) -> str:
+        return f"{CHAIN_ID}:{token.lower()}"
+
+    def load(self) -> Dict[str,Dict[str,Any]]:
+        with self.lock:
+            if self.meta is None:
+                try:
+                    self.meta = json.loads(Path(self.path).read_text()) if Path(self.path).exists() else {}
+                except Exception:
+                    self.meta = {}
+            return self.meta
+
+    def save(self):
+        with self.lock:
+            tmp = Path(self.path + ".tmp")
+            tmp.write_text(json.dumps(self.meta or {}, indent=2, sort_keys=True))
+            os.replace(tmp, self.path)
+
+    def warm(self, w3: Web3, tokens: List[str]) -> int:
+        meta = self.load()
+        missing = list(dict.fromkeys(t.lower() for t in tokens if ADDRESS_RE.match(t) and self.key(t) not in meta))
+        if not missing:
+            return 0
+        res = MULTICALL.call(w3, [(t, fn, ()) for t in missing for fn in ("decimals","symbol")])
+        added = 0
+        with self.lock:
+            for i, t in enumerate(missing):
+                dec, sym = res[2*i], res[2*i+1]
+                if isinstance(dec, Exception) or isinstance(sym, Exception):
+                    continue
+                self.meta[self.key(t)] = {"decimals": int(dec), "symbol": str(sym)}; added += 1
+        if added:
+            self.save()
+        return added
+
+    def get(self, w3: Web3, token: str) -> Tuple[int, str]:
+        meta = self.load()
+        hit = meta.get(self.key(token))
+        if hit is None:
+            self.warm(w3, [token])
+            hit = meta.get(self.key(token))
+        if hit is None:
+            return int(erc20_view(w3, token, "decimals")), fmt_addr(token)
+        return int(hit["decimals"]), str(hit["symbol"])
+
+TOKEN_META = TokenMetaCache(TOKEN_META_PATH)
+
+def known_tokens() -> List[str]:
+    return [a for _, a in p1_assets()] + [R2USDC_ADDRESS, R2USD_ADDRESS, BROKEX_USDT_ADDRESS, TOKEN_ADDRESS_P5, USDC_SP_ADDRESS]
+
+def warm_token_meta():
+    try:
+        added = TOKEN_META.warm(make_provider(RPC_URL, None), known_tokens())
+        if added: console.print(f"[muted]Metadata token tersimpan: {added} token[/muted]")
+    except Exception as e:
+        console.print(f"[warn]Warm metadata token gagal: {e}[/warn]")
+
+def get_decimals(w3: Web3, token: str) -> int:
+    return TOKEN_META.get(w3, token)[0]
+
+AllowanceKey = Tuple[str, str, str]
+
+class AllowanceLedger:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.known: Dict[AllowanceKey,int] = {}
+
+    def key(self, owner: str, token: str, spender: str) -> AllowanceKey:
+        return (owner.lower(), token.lower(), spender.lower())
+
+    def get(self, owner: str, token: str, spender: str) -> Optional[int]:
+        with self.lock:
+            return self.known.get(self.key(owner, token, spender))
+
+    def set(self, owner: str, token: str, spender: str, value: int):
+        with self.lock:
+            self.known[self.key(owner, token, spender)] = int(value)
+
+    def drop(self, owner: str, token: str, spender: str):
+        with self.lock:
+            self.known.pop(self.key(owner, token, spender), None)
+
+    def spend(self, owner: str, token: str, spender: str, units: int):
+        with self.lock:
+            k = self.key(owner, token, spender)
+            if k in self.known and self.known[k] < MAX_UINT256 // 2:
+                self.known[k] = max(0, self.known[k] - int(units))
+
+    def refresh(self, w3: Web3, keys: List[AllowanceKey], only_missing=False) -> int:
+        keys = list(dict.fromkeys(self.key(*k) for k in keys))
+        if only_missing:
+            with self.lock:
+                keys = [k for k in keys if k not in self.known]
+        res = MULTICALL.call(w3, [(t, "allowance", (to_checksum_address(o), to_checksum_address(sp))) for o, t, sp in keys])
+        n = 0
+        with self.lock:
+            for k, r in zip(keys, res):
+                if not isinstance(r, Exception):
+                    self.known[k] = int(r); n += 1
+        return n
+
+ALLOWANCES = AllowanceLedger()
+
+def approve_tx(w3: Web3, owner: str, token: str, spender: str, need: int, gas=120_000, amount=MAX_UINT256) -> Optional[Dict[str,Any]]:
+    cur = ALLOWANCES.get(owner, token, spender)
+    if cur is None or cur < need:
+        cur = int(erc20_view(w3, token, "allowance", to_checksum_address(owner), to_checksum_address(spender)))
+        ALLOWANCES.set(owner, token, spender, cur)
     if cur >= need:
+        return None
+    return contract_tx(w3, owner, token, ERC20["approve"].encode(to_checksum_address(spender), int(amount)), gas)
+
+def ensure_allowance(w3: Web3, owner: str, token: str, spender: str, need: int, pk: str, gas=120_000, amount=MAX_UINT256, label="approve"):
+    tx = approve_tx(w3, owner, token, spender, need, gas, amount)
+    if tx is None:
         return
-    tx = c.functions.approve(to_checksum_address(spender), MAX_UINT256).build_transaction({**build_tx_common(w3, owner), "gas": 120_000})
-    ok, _ = sign_send_wait(w3, tx, pk, "approve", 120_000)
+    ok, _ = sign_send_wait(w3, tx, pk, label, int(gas))
     if not ok:
+        ALLOWANCES.drop(owner, token, spender)
         raise RuntimeError("Approve gagal")
+    ALLOWANCES.set(owner, token, spender, amount)
+
+Approval = Tuple[str, str, int, int, int, str]
+
+def approve_then_send(w3: Web3, owner: str, pk: str, approvals: List[Approval], build, label: str, gas: int) -> Tuple[bool, Optional[str]]:
+    if not PIPELINE_ENABLED:
+        for token, spender, need, agas, amount, alabel in approvals:
+            ensure_allowance(w3, owner, token, spender, need, pk, agas, amount, alabel)
+        return sign_send_wait(w3, build(), pk, label, gas)
+    tok = DEFER_NONCE.set(True)
+    try:
+        action = build()
+        chain = [(tx, a) for a in approvals for tx in [approve_tx(w3, owner, *a[:5])] if tx is not None]
+    finally:
+        DEFER_NONCE.reset(tok)
+    if not chain:
+        return sign_send_wait(w3, action, pk, label, gas)
+    res = send_chain(w3, pk, [(tx, a[5], None) for tx, a in chain] + [(action, label, None)])
+    for (_, a), (ok, _) in zip(chain, res):
+        if ok: ALLOWANCES.set(owner, a[0], a[1], a[4])
+        else: ALLOWANCES.drop(owner, a[0], a[1])
+    if not all(ok for ok, _ in res[:-1]):
+        raise RuntimeError("Approve gagal")
+    return res[-1]
+
+def settle_allowance(ok: bool, owner: str, token: str, spender: str, units: int):
+    if ok: ALLOWANCES.spend(owner, token, spender, units)
+    else: ALLOWANCES.drop(owner, token, spender)
 
 def _keccak_text(s: str) -> bytes:
     try:
@@ -226,69 +1498,158 @@ def namehash(name: str) -> bytes:
 def coin_type_for_chain(chain_id: int) -> int:
     return (1 << 31) | chain_id
 
-def encode_setaddr_calldata(resolver_contract, fqdn: str, owner: str) -> bytes:
+def encode_setaddr_calldata(fqdn: str, owner: str) -> bytes:
     node = namehash(fqdn)
     ctype = coin_type_for_chain(CHAIN_ID)
-    try:
-        data = resolver_contract.encodeABI(fn_name="setAddr", args=[node, ctype, HexBytes(to_checksum_address(owner))])
-    except AttributeError:
-        data = resolver_contract.functions.setAddr(node, ctype, HexBytes(to_checksum_address(owner)))._encode_transaction_data()
-    return HexBytes(data)
-
-def fetch_brokex_proof(pair_idx: int, proxy: Optional[str], retries=5, delay_sec=5) -> str:
-    url = f"{BROKEX_PROOF_API}{pair_idx}"
-    last = None
-    proxies = {"http": proxy, "https": proxy} if proxy else None
-    for i in range(1, retries+1):
-        try:
-            r = requests.get(url, headers={"User-Agent":"Mozilla/5.0","Accept":"application/json"}, timeout=15, proxies=proxies)
-            if r.status_code != 200:
-                raise RuntimeError(f"HTTP {r.status_code}: {r.text[:160]}")
-            j = r.json()
-            p = j.get("proof") or j.get("data") or j.get("result")
-            if not p:
-                raise RuntimeError("no 'proof' field")
-            return p
-        except Exception as e:
-            last = e
-            console.print(f"[warn]Proof retry {i}/{retries}: {e}[/warn]")
-            time.sleep(delay_sec)
-    raise RuntimeError(f"fetch_proof gagal: {last}")
-
-def parse_wallets() -> List[Dict[str,str]]:
-    out = []
+    return HexBytes(RESOLVER_FNS["setAddr"].encode(node, ctype, bytes(HexBytes(to_checksum_address(owner)))))
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+class ProofCache:
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.proofs: Dict[int,Tuple[str,float]] = {}
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=len(BROKEX_PAIRS), pool_maxsize=len(BROKEX_PAIRS))
+        self.session.mount("http://", adapter); self.session.mount("https://", adapter)
+        self.thread: Optional[threading.Thread] = None
+        self.last_used = 0.0
+
+    def fetch(self, pair_idx: int, proxy: Optional[str], retries=5) -> str:
+        url = f"{BROKEX_PROOF_API}{pair_idx}"
+        last = None
+        proxies = {"http": proxy, "https": proxy} if proxy else None
+        for i in range(1, retries+1):
+            try:
+                r = self.session.get(url, headers={"User-Agent":"Mozilla/5.0","Accept":"application/json"}, timeout=15, proxies=proxies)
+                if r.status_code != 200:
+                    raise RuntimeError(f"HTTP {r.status_code}: {r.text[:160]}")
+                j = r.json()
+                p = j.get("proof") or j.get("data") or j.get("result")
+                if not p:
+                    raise RuntimeError("no 'proof' field")
+                with self.lock:
+                    self.proofs[pair_idx] = (p, time.time())
+                return p
+            except Exception as e:
+                last = e
+                if i < retries:
+                    console.print(f"[warn]Proof retry {i}/{retries}: {e}[/warn]")
+                    time.sleep(backoff_delay(i))
+        raise RuntimeError(f"fetch_proof gagal: {last}")
+
+    def fresh(self, pair_idx: int) -> Optional[str]:
+        with self.lock:
+            hit = self.proofs.get(pair_idx)
+        return hit[0] if hit and time.time() - hit[1] < self.ttl else None
+
+    def refresh_all(self):
+        with ThreadPoolExecutor(max_workers=len(BROKEX_PAIRS), thread_name_prefix="proof") as ex:
+            for f in [ex.submit(self.fetch, p["idx"], BROKEX_PROOF_PROXY, 3) for p in BROKEX_PAIRS]:
+                try: f.result()
+                except Exception as e: console.print(f"[warn]Prefetch proof gagal: {e}[/warn]")
+
+    def run(self):
+        while time.time() - self.last_used < BROKEX_PROOF_IDLE_SECS:
+            self.refresh_all()
+            time.sleep(max(1.0, self.ttl / 2))
+
+    def start(self):
+        with self.lock:
+            self.last_used = time.time()
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="proof-refresher", daemon=True)
+            self.thread.start()
+
+    def get(self, pair_idx: int, proxy: Optional[str]) -> str:
+        self.start()
+        return self.fresh(pair_idx) or self.fetch(pair_idx, proxy)
+
+PROOFS = ProofCache(BROKEX_PROOF_TTL)
+
+def fetch_brokex_proof(pair_idx: int, proxy: Optional[str]) -> str:
+    return PROOFS.get(pair_idx, proxy)
+
+class AccountRec:
+    __slots__ = ("key", "address", "proxy", "label")
+
+    def __init__(self, key: str, address: str, proxy: Optional[str] = None, label: str = ""):
+        self.key = key; self.address = address; self.proxy = proxy; self.label = label
+
+    def __repr__(self) -> str:
+        return f"AccountRec({self.label or self.address})"
+
+def wallet_entries() -> Tuple[Optional[Path], List[Tuple[str,str]]]:
     if Path(WALLETS_JSON).exists():
         try:
             data = json.loads(Path(WALLETS_JSON).read_text())
+            out = []
             for it in data:
                 pk = str((it.get("private_key") if isinstance(it, dict) else it) or "").strip()
-                if pk:
-                    addr = Account.from_key("0x"+pk[2:] if pk.startswith("0x") else pk).address
-                    out.append({"private_key": pk, "address": addr})
+                if pk: out.append((pk, str(it.get("label") or it.get("name") or "") if isinstance(it, dict) else ""))
+            if out: return Path(WALLETS_JSON), out
         except Exception:
             pass
-    if not out and Path(WALLETS_TXT).exists():
+    if Path(WALLETS_TXT).exists():
+        out = []
         for raw in Path(WALLETS_TXT).read_text().splitlines():
             line=raw.strip()
             if not line or line.startswith("#"): continue
-            pk=line.split(",")[0].strip()
-            if pk:
-                addr = Account.from_key("0x"+pk[2:] if pk.startswith("0x") else pk).address
-                out.append({"private_key": pk, "address": addr})
-    if not out and PRIVATE_KEY_ENV:
-        addr = Account.from_key("0x"+PRIVATE_KEY_ENV[2:] if PRIVATE_KEY_ENV.startswith("0x") else PRIVATE_KEY_ENV).address
-        out.append({"private_key": PRIVATE_KEY_ENV, "address": addr})
-    return out
+            parts = [x.strip() for x in line.split(",")]
+            if parts[0]: out.append((parts[0], parts[1] if len(parts) > 1 else ""))
+        if out: return Path(WALLETS_TXT), out
+    return None, ([(PRIVATE_KEY_ENV, "")] if PRIVATE_KEY_ENV else [])
+
+def derive_addresses(keys: List[str]) -> List[str]:
+    return [Account.from_key(k).address for k in keys]
+
+def derive_all(keys: List[str]) -> List[str]:
+    chunks = [keys[i:i+WALLET_DERIVE_CHUNK] for i in range(0, len(keys), WALLET_DERIVE_CHUNK)]
+    workers = min(os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        return derive_addresses(keys)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        return [a for part in ex.map(derive_addresses, chunks) for a in part]
+
+def cached_addresses(src: Optional[Path], keys: List[str]) -> List[str]:
+    if src is None:
+        return derive_addresses(keys)
+    st = src.stat(); stamp = {"source": str(src.resolve()), "mtime_ns": st.st_mtime_ns, "size": st.st_size, "count": len(keys)}
+    try:
+        cache = json.loads(Path(WALLET_CACHE_PATH).read_text())
+        if all(cache.get(k) == v for k, v in stamp.items()) and len(cache.get("addresses", [])) == len(keys):
+            return cache["addresses"]
+    except Exception:
+        pass
+    t0 = time.time(); addrs = derive_all(keys)
+    if len(keys) >= WALLET_DERIVE_CHUNK: console.print(f"[muted]Derivasi {len(keys)} alamat • {time.time()-t0:.1f}s[/muted]")
+    try:
+        tmp = Path(WALLET_CACHE_PATH + ".tmp"); tmp.write_text(json.dumps({**stamp, "addresses": addrs})); os.replace(tmp, WALLET_CACHE_PATH)
+    except Exception as e:
+        console.print(f"[warn]Cache alamat gagal disimpan: {e}[/warn]")
+    return addrs
+
+def parse_wallets() -> List[AccountRec]:
+    src, entries = wallet_entries()
+    keys, labels = [], []
+    for n, (pk, label) in enumerate(entries, 1):
+        try: keys.append(normalize_pk(pk)); labels.append(label or f"#{n}")
+        except ValueError as e: console.print(f"[warn]Private key #{n} dilewati: {e}[/warn]")
+    addrs = cached_addresses(src, keys)
+    return [AccountRec(k, a, None, l) for k, a, l in zip(keys, addrs, labels)]
 
 def _norm_proxy_url(p: str) -> Optional[str]:
     if not p: return None
     s=p.strip()
     if s.lower().startswith(("default=","all=")):
         s=s.split("=",1)[1].strip()
-    if not re.match(r"^(http|https|socks5h?|SOCKS5H?)://", s): return None
+    if not PROXY_URL_RE.match(s): return None
     return s
 
-def parse_proxies_simple(wallets: List[Dict[str,str]]) -> List[Optional[str]]:
+def parse_proxies_simple(wallets: List[AccountRec]) -> List[Optional[str]]:
     n=len(wallets)
     res=[None]*n
     if not Path(PROXIES_TXT).exists():
@@ -307,13 +1668,13 @@ def parse_proxies_simple(wallets: List[Dict[str,str]]) -> List[Optional[str]]:
             addr, px = line.split(",",1)
             addr=addr.strip()
             px=_norm_proxy_url(px.strip())
-            if px and re.match(r"^0x[0-9a-fA-F]{40}$", addr):
+            if px and ADDRESS_RE.match(addr):
                 by_addr[addr.lower()]=px
             continue
         p=_norm_proxy_url(line)
         if p: seq.append(p)
     for i,w in enumerate(wallets):
-        a=w["address"].lower()
+        a=w.address.lower()
         if a in by_addr:
             res[i]=by_addr[a]
         elif i < len(seq):
@@ -327,30 +1688,388 @@ def parse_proxies_simple(wallets: List[Dict[str,str]]) -> List[Optional[str]]:
 def normalize_pk(pk: str) -> str:
     s = pk.strip()
     if s.startswith(("0x","0X")): s=s[2:]
-    if not re.fullmatch(r"[0-9a-fA-F]{1,64}", s or ""): raise ValueError("PRIVATE_KEY invalid")
+    if not HEX_PK_RE.fullmatch(s or ""): raise ValueError("PRIVATE_KEY invalid")
     s=s.rjust(64,"0").lower()
     if s=="0"*64: raise ValueError("PRIVATE_KEY zero")
     return "0x"+s
 
-def make_provider(rpc_url: str, proxy: Optional[str]) -> Web3:
-    kwargs={"timeout":60}
-    if proxy: kwargs["proxies"]={"http":proxy,"https":proxy}
-    w3 = Web3(Web3.HTTPProvider(rpc_url, request_kwargs=kwargs))
+def load_accounts() -> List[AccountRec]:
+    accounts = parse_wallets()
+    for rec, px in zip(accounts, parse_proxies_simple(accounts)):
+        rec.proxy = px
+    return accounts
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        self.lock = threading.Lock()
+        self.rate = 0.0; self.ceiling = 0.0; self.tokens = 0.0; self.ts = time.monotonic()
+        self.paused_until = 0.0; self.cut_at = 0.0
+        self.seen = 0; self.seen_ts = time.monotonic(); self.observed = 0.0
+        self.set_rate(rate)
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self.rate = self.ceiling = max(0.0, float(rate)); self.tokens = self.rate
+        METRICS.set("rpc_limiter_rate", self.rate)
+
+    def acquire(self):
+        t0 = time.perf_counter()
+        try:
+            self.wait()
+        finally:
+            if self.rate > 0 or self.paused_until: METRICS.inc("rpc_limiter_wait_seconds_total", time.perf_counter() - t0)
+
+    def wait(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.rate <= 0:
+                    self.seen += 1
+                    if now - self.seen_ts >= 1:
+                        self.observed = self.seen / (now - self.seen_ts); self.seen = 0; self.seen_ts = now
+                    return
+                else:
+                    self.tokens = min(self.rate, self.tokens + (now - self.ts) * self.rate); self.ts = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, retry_after: Optional[float] = None):
+        with self.lock:
+            now = time.monotonic()
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+            if now - self.cut_at < 1:
+                return
+            base = self.rate or max(self.observed, self.seen / max(now - self.seen_ts, 0.1)) or RPC_AIMD_MIN_RPS * 2
+            self.rate = max(RPC_AIMD_MIN_RPS, base * RPC_AIMD_DECREASE); self.tokens = 0.0; self.ts = now; self.cut_at = now
+            rate = self.rate
+        METRICS.set("rpc_limiter_rate", rate)
+        console.print(f"[warn]RPC throttle • batas diturunkan ke {rate:.1f} rps{f' • jeda {retry_after:.0f}s' if retry_after else ''}[/warn]")
+
+    def succeeded(self):
+        if self.rate <= 0 or (self.ceiling and self.rate >= self.ceiling):
+            return
+        with self.lock:
+            self.rate = self.rate + 1 / self.rate
+            if self.ceiling: self.rate = min(self.ceiling, self.rate)
+            rate = self.rate
+        METRICS.set("rpc_limiter_rate", rate)
+
+RPC_LIMITER = RateLimiter(0)
+
+class CircuitBreaker:
+    def __init__(self, threshold: int, cooldown: float, max_cooldown: float):
+        self.lock = threading.Lock()
+        self.threshold = max(1, threshold)
+        self.base = self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.fails = 0
+        self.open_until = 0.0
+        self.tripped = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.open_until - time.monotonic())
+
+    def is_open(self) -> bool:
+        return self.open_until > time.monotonic()
+
+    def failure(self):
+        with self.lock:
+            self.fails += 1
+            if self.is_open() or (self.fails < self.threshold and not self.tripped):
+                return
+            secs = self.cooldown
+            self.open_until = time.monotonic() + secs; self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+            self.fails = 0; self.tripped = True
+        METRICS.inc("rpc_breaker_open_total")
+        console.print(f"[warn]RPC tidak sehat • scheduler dijeda {secs:.0f}s[/warn]")
+
+    def success(self):
+        if not self.fails and not self.tripped:
+            return
+        with self.lock:
+            self.fails = 0
+            if not self.tripped or self.is_open():
+                return
+            self.tripped = False; self.cooldown = self.base
+        console.print("[ok]RPC pulih • scheduler lanjut[/ok]")
+
+    def wait(self):
+        while self.is_open():
+            time.sleep(min(self.remaining(), 1.0))
+
+BREAKER = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN_SECS, BREAKER_MAX_SECS)
+
+class RpcThrottled(RuntimeError):
+    def __init__(self, msg: str, retry_after: Optional[float] = None):
+        super().__init__(msg)
+        self.retry_after = retry_after
+
+def retry_after_secs(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
     try:
-        from web3.middleware.proof_of_authority import ExtraDataToPOAMiddleware
-        w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
     except Exception:
+        return None
+
+def rpc_throttled(resp: Any) -> bool:
+    err = resp.get("error") if isinstance(resp, dict) else None
+    if not err:
+        return False
+    msg = str(err.get("message", "") if isinstance(err, dict) else err).lower()
+    return (isinstance(err, dict) and err.get("code") == -32005) or any(x in msg for x in RPC_THROTTLE_HINTS)
+
+def rpc_failure(e: Exception) -> Tuple[bool, bool, Optional[float]]:
+    if isinstance(e, RpcThrottled):
+        return True, True, e.retry_after
+    resp = getattr(e, "response", None)
+    code = getattr(resp, "status_code", None)
+    if code is not None:
+        after = retry_after_secs(resp.headers.get("Retry-After")) if code in (429, 503) else None
+        return code == 429 or code >= 500, code == 429, after
+    return isinstance(e, (requests.Timeout, requests.ConnectionError)), False, None
+
+def rpc_guarded(method: str, fn, urls: Optional[List[str]] = None, idempotent: bool = True):
+    urls = urls or [None]
+    attempt, retries = 0, max(RPC_RETRIES, len(urls) - 1)
+    while True:
+        url = urls[attempt % len(urls)]
+        BREAKER.wait()
+        RPC_LIMITER.acquire()
+        t0 = time.perf_counter()
         try:
-            from web3.middleware import geth_poa_middleware
-            w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+            out = fn(url)
+        except Exception as e:
+            METRICS.inc("rpc_errors_total", method=method)
+            transient, throttled, after = rpc_failure(e)
+            if throttled:
+                METRICS.inc("rpc_throttled_total", method=method); RPC_LIMITER.throttled(after)
+            elif transient:
+                BREAKER.failure()
+            if not transient or attempt >= retries or not (idempotent or throttled):
+                raise
+            attempt += 1
+            METRICS.inc("rpc_retries_total", method=method)
+            if attempt < len(urls):
+                continue
+            time.sleep(after if after is not None else random.uniform(0, min(RPC_BACKOFF_MAX, RPC_BACKOFF_BASE * 2 ** (attempt - len(urls) + 1))))
+            continue
+        finally:
+            METRICS.observe("rpc_request_seconds", time.perf_counter() - t0, method=method)
+        RPC_LIMITER.succeeded(); BREAKER.success()
+        return out
+
+def endpoint_label(url: str) -> str:
+    return re.sub(r"^\w+://", "", url).split("/")[0]
+
+def post_rpc(url: str, body: str, kwargs: Dict[str,Any]) -> Any:
+    t0 = time.perf_counter()
+    try:
+        r = PROVIDERS.session.post(url, data=body, **kwargs)
+        r.raise_for_status()
+        out = r.json()
+    except Exception as e:
+        if rpc_failure(e)[0]: ENDPOINTS.record(url, None)
+        raise
+    ENDPOINTS.record(url, time.perf_counter() - t0)
+    return out
+
+class EndpointPool:
+    def __init__(self, urls: List[str]):
+        self.urls = list(urls)
+        self.lock = threading.Lock()
+        self.samples: Dict[str,deque] = {u: deque(maxlen=100) for u in self.urls}
+        self.ewma: Dict[str,Optional[float]] = {u: None for u in self.urls}
+        self.heads: Dict[str,int] = {u: 0 for u in self.urls}
+        self.down_until: Dict[str,float] = {u: 0.0 for u in self.urls}
+        self.thread: Optional[threading.Thread] = None
+        self.pool: Optional[ThreadPoolExecutor] = None
+
+    def executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=max(4, 4 * len(self.urls)), thread_name_prefix="rpc")
+            return self.pool
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="rpc-probe", daemon=True); self.thread.start()
+
+    def record(self, url: str, secs: Optional[float]):
+        if len(self.urls) < 2 or url not in self.ewma:
+            return
+        with self.lock:
+            if secs is None:
+                self.down_until[url] = time.monotonic() + RPC_ENDPOINT_COOLDOWN_SECS
+            else:
+                self.samples[url].append(secs)
+                prev = self.ewma[url]; self.ewma[url] = secs if prev is None else prev * 0.8 + secs * 0.2
+        if secs is None: METRICS.inc("rpc_endpoint_errors_total", endpoint=endpoint_label(url))
+
+    def order(self, own: str) -> List[str]:
+        if len(self.urls) < 2 or own not in self.ewma:
+            return [own]
+        self.start()
+        with self.lock:
+            now, top = time.monotonic(), max(self.heads.values())
+            ok = [u for u in self.urls if now >= self.down_until[u] and self.heads[u] >= top - RPC_MAX_LAG_BLOCKS]
+            ok.sort(key=lambda u: self.ewma[u] if self.ewma[u] is not None else 0.0)
+            return ok + sorted((u for u in self.urls if u not in ok), key=lambda u: self.down_until[u])
+
+    def hedge_delay(self, url: str) -> float:
+        with self.lock:
+            xs = sorted(self.samples.get(url) or ())
+        high = xs[min(len(xs)-1, int(len(xs) * RPC_HEDGE_PCT))] if xs else 0.0
+        return max(RPC_HEDGE_MIN_MS / 1000, high)
+
+    def hedged(self, fn, url: str, urls: List[str]):
+        alt = next((u for u in urls if u != url), None)
+        if alt is None:
+            return fn(url)
+        ex = self.executor()
+        futs = {ex.submit(fn, url)}
+        done, _ = futures_wait(futs, timeout=self.hedge_delay(url))
+        if not done:
+            RPC_LIMITER.acquire(); METRICS.inc("rpc_hedged_total")
+            futs.add(ex.submit(fn, alt))
+        err, best = None, None
+        while futs:
+            done, futs = futures_wait(futs, return_when=FIRST_COMPLETED)
+            for f in done:
+                try: r = f.result()
+                except Exception as e: err = e; continue
+                if not self.nulls(r): return r
+                if best is None or self.nulls(r) < self.nulls(best): best = r
+        if best is not None:
+            return best
+        raise err
+
+    @staticmethod
+    def nulls(resp: Any) -> int:
+        return sum(1 for d in (resp if isinstance(resp, list) else [resp]) if isinstance(d, dict) and "result" in d and d["result"] is None)
+
+    def broadcast(self, fn, urls: List[str]):
+        if len(urls) < 2:
+            return fn(urls[0])
+        results = []
+        for f in as_completed([self.executor().submit(fn, u) for u in urls]):
+            try: r = f.result()
+            except Exception as e: results.append(e); continue
+            if not (isinstance(r, dict) and r.get("error") is not None): return r
+            results.append(r)
+        for r in results:
+            if not isinstance(r, Exception): return r
+        raise results[0]
+
+    def probe(self):
+        def one(url: str):
+            t0 = time.perf_counter()
+            try:
+                r = PROVIDERS.session.post(url, json={"jsonrpc":"2.0","id":0,"method":"eth_blockNumber","params":[]}, timeout=min(RPC_TIMEOUT_SECS, 5))
+                r.raise_for_status()
+                return url, int(r.json()["result"], 16), time.perf_counter() - t0
+            except Exception:
+                return url, None, None
+        for url, head, secs in self.executor().map(one, self.urls):
+            self.record(url, secs)
+            if head is None:
+                continue
+            with self.lock:
+                self.heads[url] = head; self.down_until[url] = 0.0
+                lat = self.ewma[url]
+            METRICS.set("rpc_endpoint_head", head, endpoint=endpoint_label(url))
+            METRICS.set("rpc_endpoint_latency_seconds", lat, endpoint=endpoint_label(url))
+
+    def run(self):
+        while True:
+            try: self.probe()
+            except Exception: pass
+            time.sleep(RPC_PROBE_SECS)
+
+ENDPOINTS = EndpointPool(RPC_URLS)
+
+class LimitedHTTPProvider(Web3.HTTPProvider):
+    _middlewares = ()
+
+    def make_request(self, method, params):
+        body = self.encode_rpc_request(method, params); kwargs = dict(self.get_request_kwargs())
+        def call(url: str):
+            resp = post_rpc(url, body, kwargs)
+            if rpc_throttled(resp): raise RpcThrottled(str(resp["error"]))
+            return resp
+        urls = ENDPOINTS.order(self.endpoint_uri)
+        fn = call
+        if method in NON_IDEMPOTENT_METHODS: fn = lambda u: ENDPOINTS.broadcast(call, urls)
+        elif method in HEDGE_METHODS: fn = lambda u: ENDPOINTS.hedged(call, u, urls)
+        try:
+            resp = rpc_guarded(method, fn, urls, idempotent=method not in NON_IDEMPOTENT_METHODS)
+        finally:
+            METRICS.inc("rpc_calls_total", method=method)
+        if isinstance(resp, dict) and resp.get("error") is not None:
+            METRICS.inc("rpc_errors_total", method=method)
+        return resp
+
+class ProviderPool:
+    def __init__(self, pool_size: int):
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter); self.session.mount("https://", adapter)
+        self.providers: Dict[Tuple[str,Optional[str]],Web3] = {}
+        self.healthy: set = set()
+
+    def build(self, rpc_url: str, proxy: Optional[str]) -> Web3:
+        kwargs={"timeout":RPC_TIMEOUT_SECS}
+        if proxy: kwargs["proxies"]={"http":proxy,"https":proxy}
+        w3 = Web3(LimitedHTTPProvider(rpc_url, request_kwargs=kwargs, session=self.session))
+        try:
+            from web3.middleware.proof_of_authority import ExtraDataToPOAMiddleware
+            w3.middleware_onion.inject(ExtraDataToPOAMiddleware, layer=0)
+        except Exception:
+            try:
+                from web3.middleware import geth_poa_middleware
+                w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+            except Exception:
+                pass
+        try:
+            from web3.middleware.cache import construct_simple_cache_middleware
+            w3.middleware_onion.add(construct_simple_cache_middleware(rpc_whitelist={"eth_chainId","net_version"}), "chain_id_cache")
         except Exception:
             pass
-    if not w3.is_connected(): raise RuntimeError(f"Gagal konek RPC: {rpc_url}")
-    return w3
+        return w3
+
+    def get(self, rpc_url: str, proxy: Optional[str]) -> Web3:
+        k = (rpc_url, proxy)
+        with self.lock:
+            w3 = self.providers.get(k)
+            if w3 is None:
+                w3 = self.providers[k] = self.build(rpc_url, proxy)
+        if k not in self.healthy:
+            if not w3.is_connected(): raise RuntimeError(f"Gagal konek RPC: {rpc_url}")
+            self.healthy.add(k)
+        return w3
+
+PROVIDERS = ProviderPool(RPC_POOL_SIZE)
+
+def make_provider(rpc_url: str, proxy: Optional[str]) -> Web3:
+    HEADS.start()
+    return PROVIDERS.get(rpc_url, proxy)
 
 def load_config() -> Dict[str,Any]:
     default = {
-        "global":{"aio_sleep_hours":24},
+        "global":{"aio_sleep_hours":24,"workers":4,"max_rps":20},
         "programs":{
             "p1":{"enable_faucet":True,"amount_mode":"range","fixed":"0.05","min":"0.01","max":"0.09","repeat":5,"delay":120},
             "p2":{"count":5,"delay":180},
@@ -363,7 +2082,7 @@ def load_config() -> Dict[str,Any]:
     if Path(CONFIG_PATH).exists():
         try:
             cur=json.loads(Path(CONFIG_PATH).read_text())
-            return {**default, **cur, "programs":{**default["programs"], **cur.get("programs",{})}}
+            return {**default, **cur, "global":{**default["global"], **cur.get("global",{})}, "programs":{**default["programs"], **cur.get("programs",{})}}
         except Exception:
             return default
     Path(CONFIG_PATH).write_text(json.dumps(default, indent=2))
@@ -396,45 +2115,62 @@ def ask_dec(prompt: str, default: Optional[Decimal]=None, minv: Optional[Decimal
 
 def p1_assets() -> List[Tuple[str,str]]:
     out=[]
-    if re.match(r"^0x[0-9a-fA-F]{40}$", ASSET_GOLD): out.append(("GOLD",ASSET_GOLD))
-    if re.match(r"^0x[0-9a-fA-F]{40}$", ASSET_TSLA): out.append(("TSLA",ASSET_TSLA))
-    if re.match(r"^0x[0-9a-fA-F]{40}$", ASSET_NVIDIA): out.append(("NVIDIA",ASSET_NVIDIA))
-    if re.match(r"^0x[0-9a-fA-F]{40}$", ASSET_USDC): out.append(("USDC",ASSET_USDC))
-    if re.match(r"^0x[0-9a-fA-F]{40}$", ASSET_USDT): out.append(("USDT",ASSET_USDT))
-    if re.match(r"^0x[0-9a-fA-F]{40}$", ASSET_WPHRS): out.append(("WPHRS",ASSET_WPHRS))
+    if ADDRESS_RE.match(ASSET_GOLD): out.append(("GOLD",ASSET_GOLD))
+    if ADDRESS_RE.match(ASSET_TSLA): out.append(("TSLA",ASSET_TSLA))
+    if ADDRESS_RE.match(ASSET_NVIDIA): out.append(("NVIDIA",ASSET_NVIDIA))
+    if ADDRESS_RE.match(ASSET_USDC): out.append(("USDC",ASSET_USDC))
+    if ADDRESS_RE.match(ASSET_USDT): out.append(("USDT",ASSET_USDT))
+    if ADDRESS_RE.match(ASSET_WPHRS): out.append(("WPHRS",ASSET_WPHRS))
     return out
 
 def p1_faucet_mint(w3: Web3, asset: str, to: str, human_amount_18: Decimal, label: str, pk: str):
     console.print(f"[muted]Faucet {label}[/muted]")
     try:
-        f = w3.eth.contract(address=to_checksum_address(FAUCET_ADDRESS), abi=FAUCET_ABI)
         amt = to_units(human_amount_18, 18)
-        tx = f.functions.mint(to_checksum_address(asset), to_checksum_address(to), int(amt)).build_transaction({**build_tx_common(w3, to), "gas": 120_000})
+        tx = contract_tx(w3, to, FAUCET_ADDRESS, FAUCET["mint"].encode(to_checksum_address(asset), to_checksum_address(to), int(amt)), 120_000)
         ok, hx = sign_send_wait(w3, tx, pk, f"faucet {label}", 120_000)
         if ok: console.print(f"[ok]Faucet {label} {human_amount_18} • {tx_link(hx)}[/ok]")
         else: console.print(f"[err]Faucet {label} gagal[/err]")
+        return ok
     except Exception as e:
         console.print(f"[err]Faucet {label} gagal dikirim: {e}[/err]")
+        return False
+
+def p1_faucet_pipeline(w3: Web3, mints: List[Tuple[str,str]], to: str, human_amount_18: Decimal, pk: str):
+    amt = to_units(human_amount_18, 18)
+    tok = DEFER_NONCE.set(True)
+    try:
+        items = [(contract_tx(w3, to, FAUCET_ADDRESS, FAUCET["mint"].encode(to_checksum_address(asset), to_checksum_address(to), int(amt)), 120_000), f"faucet {label}", f"faucet:{label}") for label, asset in mints]
+    except Exception as e:
+        console.print(f"[err]Faucet gagal dikirim: {e}[/err]"); return
+    finally:
+        DEFER_NONCE.reset(tok)
+    for (label, _), (_, _, step), (ok, hx) in zip(mints, items, send_chain(w3, pk, items, dependent=False)):
+        if ok: console.print(f"[ok]Faucet {label} {human_amount_18} • {tx_link(hx)}[/ok]"); step_done(step)
+        else: console.print(f"[err]Faucet {label} gagal[/err]")
 
 def p1_pool_supply(w3: Web3, token: str, sender: str, human_amount: Decimal, pk: str):
-    ctoken = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    pool  = w3.eth.contract(address=to_checksum_address(POOL_ADDRESS), abi=POOL_ABI)
-    dec   = int(ctoken.functions.decimals().call())
-    sym   = str(ctoken.functions.symbol().call())
+    dec, sym = TOKEN_META.get(w3, token)
     amt   = to_units(human_amount, dec)
-    ensure_approval(w3, token, sender, POOL_ADDRESS, amt, pk)
-    tx = pool.functions.supply(to_checksum_address(token), int(amt), to_checksum_address(sender), 0).build_transaction({**build_tx_common(w3, sender), "gas": 220_000})
-    ok, hx = sign_send_wait(w3, tx, pk, f"supply {sym}", 220_000)
+    ok, hx = approve_then_send(w3, sender, pk, [(token, POOL_ADDRESS, amt, 120_000, MAX_UINT256, "approve")],
+                               lambda: contract_tx(w3, sender, POOL_ADDRESS, POOL["supply"].encode(to_checksum_address(token), int(amt), to_checksum_address(sender), 0), 220_000), f"supply {sym}", 220_000)
+    settle_allowance(ok, sender, token, POOL_ADDRESS, amt)
     if ok: console.print(f"[ok]Supply {sym} {human_amount} • {tx_link(hx)}[/ok]")
     else: console.print("[err]Supply gagal[/err]")
+    return ok
 
-def run_program_1(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
+def program_1(rec: AccountRec, cfg: Dict[str,Any]):
     console.print(Rule(style="accent")); console.print("[title]Program 1 — Lend & Borrow[/title]", justify="center"); console.print(Rule(style="accent"))
-    w3 = make_provider(RPC_URL, proxy); acct = Account.from_key(pk).address
+    w3 = make_provider(RPC_URL, rec.proxy); acct, pk = rec.address, rec.key
     if cfg.get("enable_faucet", True):
-        for label, addr in [("GOLD",ASSET_GOLD),("TSLA",ASSET_TSLA),("NVIDIA",ASSET_NVIDIA)]:
-            if re.match(r"^0x[0-9a-fA-F]{40}$", addr):
-                p1_faucet_mint(w3, addr, acct, FAUCET_AMOUNT, label, pk)
+        faucets = [(label, addr) for label, addr in [("GOLD",ASSET_GOLD),("TSLA",ASSET_TSLA),("NVIDIA",ASSET_NVIDIA)] if ADDRESS_RE.match(addr)]
+        if PIPELINE_ENABLED:
+            mints = [(label, addr) for label, addr in faucets if step_todo(f"faucet:{label}")]
+            if mints: p1_faucet_pipeline(w3, mints, acct, FAUCET_AMOUNT, pk)
+        else:
+            for label, addr in faucets:
+                if step_todo(f"faucet:{label}"):
+                    if p1_faucet_mint(w3, addr, acct, FAUCET_AMOUNT, label, pk): step_done()
     assets = p1_assets()
     if not assets:
         console.print("[warn]Tidak ada aset untuk supply.[/warn]")
@@ -444,233 +2180,237 @@ def run_program_1(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
     fixed = Decimal(str(cfg.get("fixed","0.05")))
     minv  = Decimal(str(cfg.get("min","0.01")))
     maxv  = Decimal(str(cfg.get("max","0.09")))
+    budget = dict(PREFLIGHT.plan(acct).get("p1", {}))
     for r in range(1, repeat+1):
         aset_now = assets[:]; random.shuffle(aset_now)
         console.print(Panel.fit(f"Siklus {r}/{repeat} — {len(aset_now)} tx", style="accent"))
-        for i, (_, token) in enumerate(aset_now, 1):
+        for i, (label, token) in enumerate(aset_now, 1):
+            if not step_todo(f"supply:{r}:{label}"):
+                continue
+            if token.lower() in budget:
+                if budget[token.lower()] <= 0:
+                    console.print(f"[warn]Saldo {label} tidak cukup, supply dilewati (pre-flight)[/warn]"); continue
+                budget[token.lower()] -= 1
             if mode == "fixed":
                 amt = fixed
             else:
                 amt = Decimal(str(random.uniform(float(minv), float(maxv)))).quantize(Decimal("0.000000000000000001"))
             try:
-                p1_pool_supply(w3, token, acct, amt, pk)
+                if p1_pool_supply(w3, token, acct, amt, pk): step_done()
             except Exception as e:
                 console.print(f"[err]Supply gagal: {e}[/err]")
             if i < len(aset_now):
-                sleep_countdown(int(delay + random.uniform(0, TX_DELAY_JITTER_SECS)), "Jeda")
+                yield int(delay + random.uniform(0, TX_DELAY_JITTER_SECS)), "Jeda"
         if r < repeat:
-            sleep_countdown(int(delay + random.uniform(0, TX_DELAY_JITTER_SECS)), "Jeda antar siklus")
+            yield int(delay + random.uniform(0, TX_DELAY_JITTER_SECS)), "Jeda antar siklus"
 
 def random_label(min_len=12, max_len=22) -> str:
     import string
     n = random.randint(min_len, max_len)
     return "".join(random.choice(string.ascii_lowercase) for _ in range(n))
 
-def p2_register_once(w3: Web3, controller, resolver, sender: str, pk: str) -> bool:
+def p2_register_once(w3: Web3, sender: str, pk: str):
     duration = 365*24*3600
     label = random_label()
     fqdn = f"{label}.{TLD}"
-    data_array = [encode_setaddr_calldata(resolver, fqdn, sender)]
+    data_array = [encode_setaddr_calldata(fqdn, sender)]
     reverse = True
-    price = controller.functions.rentPrice(label, duration).call()
+    price = call_view(w3, CONTROLLER, CONTROLLER_FNS["rentPrice"], label, duration)
     total = int(price[0]) + int(price[1])
     tip = (total * max(TIP_BPS, 0)) // 10000
     value_to_send = total + tip
     secret = HexBytes(os.urandom(32))
-    commitment = controller.functions.makeCommitment(label, sender, duration, secret, to_checksum_address(RESOLVER), data_array, reverse, 0).call()
-    tx = controller.functions.commit(commitment).build_transaction({**build_tx_common(w3, sender)})
+    commitment = call_view(w3, CONTROLLER, CONTROLLER_FNS["makeCommitment"], label, to_checksum_address(sender), duration, bytes(secret), to_checksum_address(RESOLVER), [bytes(d) for d in data_array], reverse, 0)
+    tx = contract_tx(w3, sender, CONTROLLER, CONTROLLER_FNS["commit"].encode(commitment))
     ok, _ = sign_send_wait(w3, tx, pk, "commit", 120_000)
     if not ok:
         return False
     try:
-        min_age = int(controller.functions.minCommitmentAge().call())
+        min_age = int(call_view(w3, CONTROLLER, CONTROLLER_FNS["minCommitmentAge"]))
     except Exception:
         min_age = 60
-    sleep_countdown(min_age + EXTRA_WAIT, "Menunggu minCommitmentAge")
-    tx = controller.functions.register(label, sender, duration, secret, to_checksum_address(RESOLVER), data_array, reverse, 0).build_transaction({**build_tx_common(w3, sender), "value": int(value_to_send), "gas": 500_000})
+    yield min_age + EXTRA_WAIT, "Menunggu minCommitmentAge"
+    tx = contract_tx(w3, sender, CONTROLLER, CONTROLLER_FNS["register"].encode(label, to_checksum_address(sender), duration, bytes(secret), to_checksum_address(RESOLVER), [bytes(d) for d in data_array], reverse, 0), 500_000, value_to_send)
     ok, hx = sign_send_wait(w3, tx, pk, f"register {fqdn}", 500_000)
     if ok:
         console.print(f"[ok]Nama terdaftar: {fqdn} • {tx_link(hx)}[/ok]")
     return ok
 
-def run_program_2(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
+def program_2(rec: AccountRec, cfg: Dict[str,Any]):
     console.print(Rule(style="accent")); console.print("[title]Program 2 — Add Domain[/title]", justify="center"); console.print(Rule(style="accent"))
-    w3 = make_provider(RPC_URL, proxy); acct = Account.from_key(pk).address
-    controller = w3.eth.contract(address=to_checksum_address(CONTROLLER), abi=CONTROLLER_ABI)
-    resolver   = w3.eth.contract(address=to_checksum_address(RESOLVER),   abi=RESOLVER_ABI)
+    w3 = make_provider(RPC_URL, rec.proxy); acct, pk = rec.address, rec.key
     count = int(cfg.get("count",5)); delay = int(cfg.get("delay",180))
     for i in range(1, count+1):
+        if not step_todo(f"register:{i}"):
+            continue
         console.print(Panel.fit(f"Registrasi {i}/{count}", style="accent"))
         try:
-            ok = p2_register_once(w3, controller, resolver, acct, pk)
-            if not ok: console.print("[err]Registrasi gagal[/err]")
+            ok = yield from p2_register_once(w3, acct, pk)
+            if ok: step_done()
+            else: console.print("[err]Registrasi gagal[/err]")
         except Exception as e:
             console.print(f"[err]Gagal daftar: {e}[/err]")
         if i < count:
-            sleep_countdown(delay, "Jeda sebelum domain berikutnya")
+            yield delay, "Jeda sebelum domain berikutnya"
     console.print("[ok]Program 2 selesai.[/ok]")
 
-def ensure_approval_tok(w3: Web3, acct: str, token: str, spender: str, min_amt: int, pk: str):
-    c = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    cur = int(c.functions.allowance(acct, to_checksum_address(spender)).call())
-    if cur >= min_amt:
-        return
-    tx = c.functions.approve(to_checksum_address(spender), MAX_UINT256).build_transaction({**build_tx_common(w3, acct), "gas": 300_000})
-    ok, _ = sign_send_wait(w3, tx, pk, "approve", 300_000)
-    if not ok:
-        raise RuntimeError("Approve gagal")
-
 def swap_usdc_to_r2usd(w3: Web3, acct: str, amt: Decimal, dec_usdc: int, pk: str):
     units = to_units(amt, dec_usdc)
-    ensure_approval_tok(w3, acct, R2USDC_ADDRESS, ROUTER_ADDRESS, units, pk)
     data = Web3.to_hex(SEL_USDC_TO_R2USD + abi_encode(["address","uint256","uint256","uint256","uint256","uint256","uint256"], [acct, units,0,0,0,0,0]))
-    tx = {"to": to_checksum_address(ROUTER_ADDRESS), **build_tx_common(w3, acct), "data": data, "gas": 500_000, "value": 0}
-    ok, _ = sign_send_wait(w3, tx, pk, "swap USDC→R2USD", 500_000)
+    ok, _ = approve_then_send(w3, acct, pk, [(R2USDC_ADDRESS, ROUTER_ADDRESS, units, 300_000, MAX_UINT256, "approve")],
+                              lambda: {"to": to_checksum_address(ROUTER_ADDRESS), **build_tx_common(w3, acct), "data": data, "gas": 500_000, "value": 0}, "swap USDC→R2USD", 500_000)
+    settle_allowance(ok, acct, R2USDC_ADDRESS, ROUTER_ADDRESS, units)
     if not ok: raise RuntimeError("Swap reverted")
 
 def swap_r2usd_to_usdc(w3: Web3, acct: str, amt: Decimal, dec_r2: int, pk: str):
     units = to_units(amt, dec_r2)
-    ensure_approval_tok(w3, acct, R2USD_ADDRESS, ROUTER_ADDRESS, units, pk)
     data = Web3.to_hex(SEL_R2USD_TO_USDC + abi_encode(["address","uint256"], [acct, units]))
-    tx = {"to": to_checksum_address(ROUTER_ADDRESS), **build_tx_common(w3, acct), "data": data, "gas": 500_000, "value": 0}
-    ok, _ = sign_send_wait(w3, tx, pk, "swap R2USD→USDC", 500_000)
+    ok, _ = approve_then_send(w3, acct, pk, [(R2USD_ADDRESS, ROUTER_ADDRESS, units, 300_000, MAX_UINT256, "approve")],
+                              lambda: {"to": to_checksum_address(ROUTER_ADDRESS), **build_tx_common(w3, acct), "data": data, "gas": 500_000, "value": 0}, "swap R2USD→USDC", 500_000)
+    settle_allowance(ok, acct, R2USD_ADDRESS, ROUTER_ADDRESS, units)
     if not ok: raise RuntimeError("Swap reverted")
 
 def stake_r2usd(w3: Web3, acct: str, amt: Decimal, dec_r2: int, pk: str):
     units = to_units(amt, dec_r2)
-    ensure_approval_tok(w3, acct, R2USD_ADDRESS, STAKING_CONTRACT, units, pk)
     data = Web3.to_hex(SEL_STAKE + abi_encode(["uint256","uint256","uint256","uint8","uint256","uint256"], [units,0,0,0,0,0]))
-    tx = {"to": to_checksum_address(STAKING_CONTRACT), **build_tx_common(w3, acct), "data": data, "gas": 500_000, "value": 0}
-    ok, _ = sign_send_wait(w3, tx, pk, "stake R2USD", 500_000)
+    ok, _ = approve_then_send(w3, acct, pk, [(R2USD_ADDRESS, STAKING_CONTRACT, units, 300_000, MAX_UINT256, "approve")],
+                              lambda: {"to": to_checksum_address(STAKING_CONTRACT), **build_tx_common(w3, acct), "data": data, "gas": 500_000, "value": 0}, "stake R2USD", 500_000)
+    settle_allowance(ok, acct, R2USD_ADDRESS, STAKING_CONTRACT, units)
     if not ok: raise RuntimeError("Stake reverted")
 
-def run_program_3(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
+def program_3(rec: AccountRec, cfg: Dict[str,Any]):
     console.print(Rule(style="accent")); console.print("[title]Program 3 — Swap & Earn R2[/title]", justify="center"); console.print(Rule(style="accent"))
-    w3 = make_provider(RPC_URL, proxy); acct = Account.from_key(pk).address
+    w3 = make_provider(RPC_URL, rec.proxy); acct, pk = rec.address, rec.key
     du = get_decimals(w3, R2USDC_ADDRESS); dr = get_decimals(w3, R2USD_ADDRESS)
     d = cfg.get("start_dir","random"); d = 1 if d=="1" else (2 if d=="2" else random.choice([1,2]))
     swap_times = int(cfg.get("swap_times",5)); delay = int(cfg.get("delay",60))
+    plan = PREFLIGHT.plan(acct); d = plan.get("p3_dir", d)
+    if plan.get("p3_swaps") == 0:
+        console.print("[warn]Saldo USDC & R2USD tidak cukup, swap dilewati (pre-flight)[/warn]"); swap_times = 0
     swap_amount = Decimal(str(cfg.get("swap_amount","0.1"))).quantize(Decimal("0.000001"))
     for i in range(1, swap_times+1):
+        if not step_todo(f"swap:{i}"):
+            d = 2 if d == 1 else 1; continue
         console.print(Panel.fit(f"SWAP {i}/{swap_times}", style="accent"))
         try:
             if d == 1: swap_usdc_to_r2usd(w3, acct, swap_amount, du, pk); d = 2
             else: swap_r2usd_to_usdc(w3, acct, swap_amount, dr, pk); d = 1
+            step_done()
         except Exception as e:
             console.print(f"[err]Swap gagal: {e}[/err]")
-        if i < swap_times: sleep_countdown(delay, "Jeda swap")
+        if i < swap_times: yield delay, "Jeda swap"
     if bool(cfg.get("do_stake",True)):
-        sleep_countdown(delay, "Jeda sebelum STAKING")
+        yield delay, "Jeda sebelum STAKING"
         if cfg.get("stake_mode","random")=="random":
             times=random.randint(int(cfg.get("stake_rand_min",1)), int(cfg.get("stake_rand_max",5)))
         else:
             times=int(cfg.get("stake_times",1))
+        times = PREFLIGHT.cap(acct, "p3_stakes", times, "Staking")
         stake_amount=Decimal(str(cfg.get("stake_amount","0.1"))).quantize(Decimal("0.000001"))
         for j in range(1, times+1):
+            if not step_todo(f"stake:{j}"):
+                continue
             console.print(Panel.fit(f"STAKING {j}/{times}", style="accent"))
-            try: stake_r2usd(w3, acct, stake_amount, dr, pk)
+            try: stake_r2usd(w3, acct, stake_amount, dr, pk); step_done()
             except Exception as e: console.print(f"[err]Stake gagal: {e}[/err]")
-            if j < times: sleep_countdown(delay, "Jeda staking")
+            if j < times: yield delay, "Jeda staking"
     console.print("[ok]Program 3 selesai.[/ok]")
 
-def ensure_approval_p4(w3: Web3, acct: str, token: str, spender: str, need: int, pk: str):
-    c = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    cur = int(c.functions.allowance(acct, to_checksum_address(spender)).call())
-    if cur >= need: return
-    tx = c.functions.approve(to_checksum_address(spender), MAX_UINT256).build_transaction({**build_tx_common(w3, acct), "gas":300_000})
-    ok, _ = sign_send_wait(w3, tx, pk, "approve (Brokex)", 300_000)
-    if not ok: raise RuntimeError("Approve gagal")
-
 def brokex_trade_once(w3: Web3, acct: str, pk: str, proxy: Optional[str]):
     dec = get_decimals(w3, BROKEX_USDT_ADDRESS)
     amount = Decimal(random.uniform(15,20)).quantize(Decimal("0.000001"))
     units  = to_units(amount, dec)
-    ensure_approval_p4(w3, acct, BROKEX_USDT_ADDRESS, BROKEX_POOL_ROUTER_ADDRESS, units, pk)
-    ensure_approval_p4(w3, acct, BROKEX_USDT_ADDRESS, BROKEX_TRADE_ROUTER_ADDRESS, units, pk)
+    spenders = (BROKEX_POOL_ROUTER_ADDRESS, BROKEX_TRADE_ROUTER_ADDRESS)
+    ALLOWANCES.refresh(w3, [(acct, BROKEX_USDT_ADDRESS, sp) for sp in spenders], only_missing=True)
     pair = random.choice(BROKEX_PAIRS); is_long = random.choice([True, False])
-    proof = fetch_brokex_proof(pair["idx"], proxy)
-    c = w3.eth.contract(address=to_checksum_address(BROKEX_TRADE_ROUTER_ADDRESS), abi=BROKEX_ABI)
-    tx = c.functions.openPosition(int(pair["idx"]), proof, bool(is_long), 1, int(units), 0, 0).build_transaction({**build_tx_common(w3, acct), "gas": 2_000_000})
-    ok, hx = sign_send_wait(w3, tx, pk, f"Brokex {pair['name']} {'Long' if is_long else 'Short'} size {amount}", 2_000_000)
+    def build():
+        proof = fetch_brokex_proof(pair["idx"], proxy)
+        return contract_tx(w3, acct, BROKEX_TRADE_ROUTER_ADDRESS, BROKEX["openPosition"].encode(int(pair["idx"]), bytes(HexBytes(proof)), bool(is_long), 1, int(units), 0, 0), 2_000_000)
+    ok, hx = approve_then_send(w3, acct, pk, [(BROKEX_USDT_ADDRESS, sp, units, 300_000, MAX_UINT256, "approve (Brokex)") for sp in spenders],
+                               build, f"Brokex {pair['name']} {'Long' if is_long else 'Short'} size {amount}", 2_000_000)
+    settle_allowance(ok, acct, BROKEX_USDT_ADDRESS, BROKEX_TRADE_ROUTER_ADDRESS, units)
     if not ok: raise RuntimeError("openPosition reverted")
     console.print(f"[ok]Trade • {tx_link(hx)}[/ok]")
 
-def run_program_4(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
+def program_4(rec: AccountRec, cfg: Dict[str,Any]):
     console.print(Rule(style="accent")); console.print("[title]Program 4 — Brokex Trade[/title]", justify="center"); console.print(Rule(style="accent"))
-    w3 = make_provider(RPC_URL, proxy); acct = Account.from_key(pk).address
+    PROOFS.start()
+    w3 = make_provider(RPC_URL, rec.proxy); acct, pk = rec.address, rec.key
     runs=int(cfg.get("runs",5)); delay=int(cfg.get("delay",60))
+    runs = PREFLIGHT.cap(acct, "p4", runs, "Trade")
     for i in range(1, runs+1):
+        if not step_todo(f"trade:{i}"):
+            continue
         console.print(Panel.fit(f"Trade {i}/{runs}", style="accent"))
-        try: brokex_trade_once(w3, acct, pk, proxy)
+        try: brokex_trade_once(w3, acct, pk, rec.proxy); step_done()
         except Exception as e: console.print(f"[err]Trade gagal: {e}[/err]")
-        if i < runs: sleep_countdown(delay, "Jeda trade")
+        if i < runs: yield delay, "Jeda trade"
     console.print("[ok]Program 4 selesai.[/ok]")
 
-def ensure_approve_p5(w3: Web3, sender: str, token: str, spender: str, need: int, pk: str) -> bool:
-    c = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    cur = int(c.functions.allowance(sender, to_checksum_address(spender)).call())
-    if cur >= need: return True
+def do_deposit_once(w3: Web3, sender: str, token: str, depo_addr: str, human_amount: Decimal, pk: str) -> bool:
+    dec    = get_decimals(w3, token)
+    units  = to_units(human_amount, dec)
     try:
-        amt = MAX_UINT256 if MAX_APPROVE_P5 else need
-        tx = c.functions.approve(to_checksum_address(spender), int(amt)).build_transaction({**build_tx_common(w3, sender), "gas": int(70000*GAS_MULT_P5)})
-        ok, _ = sign_send_wait(w3, tx, pk, "approve (P5)", int(70000*GAS_MULT_P5))
-        return ok
+        ok, hx = approve_then_send(w3, sender, pk, [(token, depo_addr, units, int(70000*GAS_MULT_P5), MAX_UINT256 if MAX_APPROVE_P5 else units, "approve (P5)")],
+                                   lambda: contract_tx(w3, sender, depo_addr, DEPOSIT["deposit"].encode(to_checksum_address(token), int(units)), int(120000*GAS_MULT_P5)), f"deposit {human_amount}", int(120000*GAS_MULT_P5))
     except Exception as e:
         console.print(f"[err]Approve gagal: {e}[/err]"); return False
-
-def do_deposit_once(w3: Web3, sender: str, token: str, depo_addr: str, human_amount: Decimal, pk: str) -> bool:
-    ctoken = w3.eth.contract(address=to_checksum_address(token), abi=ERC20_ABI)
-    dep    = w3.eth.contract(address=to_checksum_address(depo_addr), abi=DEPOSIT_ABI)
-    dec    = int(ctoken.functions.decimals().call())
-    units  = to_units(human_amount, dec)
-    if not ensure_approve_p5(w3, sender, token, depo_addr, units, pk): return False
-    tx = dep.functions.deposit(to_checksum_address(token), int(units)).build_transaction({**build_tx_common(w3, sender), "gas": int(120000*GAS_MULT_P5)})
-    ok, hx = sign_send_wait(w3, tx, pk, f"deposit {human_amount}", int(120000*GAS_MULT_P5))
+    settle_allowance(ok, sender, token, depo_addr, units)
     if ok: console.print(f"[ok]Deposit • {tx_link(hx)}[/ok]")
     return ok
 
-def run_program_5(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
+def program_5(rec: AccountRec, cfg: Dict[str,Any]):
     console.print(Rule(style="accent")); console.print("[title]Program 5 — RwaTrade (Deposit)[/title]", justify="center"); console.print(Rule(style="accent"))
-    w3 = make_provider(RPC_URL, proxy); sender = Account.from_key(pk).address
+    w3 = make_provider(RPC_URL, rec.proxy); sender, pk = rec.address, rec.key
     runs = int(cfg.get("runs",5)); delay=int(cfg.get("delay",180))
+    runs = PREFLIGHT.cap(sender, "p5", runs, "Deposit")
     for i in range(1, runs+1):
+        if not step_todo(f"deposit:{i}"):
+            continue
         console.print(Panel.fit(f"Deposit {i}/{runs} • amount {DEPOSIT_AMOUNT_P5}", style="accent"))
-        try: do_deposit_once(w3, sender, TOKEN_ADDRESS_P5, DEPOSIT_CONTRACT_P5, DEPOSIT_AMOUNT_P5, pk)
+        try:
+            if do_deposit_once(w3, sender, TOKEN_ADDRESS_P5, DEPOSIT_CONTRACT_P5, DEPOSIT_AMOUNT_P5, pk): step_done()
         except Exception as e: console.print(f"[err]Deposit gagal: {e}[/err]")
-        if i < runs: sleep_countdown(delay, "Jeda deposit")
+        if i < runs: yield delay, "Jeda deposit"
     console.print("[ok]Program 5 selesai.[/ok]")
 
-def ensure_allow_spout(w3: Web3, acct: str, dec: int, need_amt: Decimal, pk: str):
-    c = w3.eth.contract(address=to_checksum_address(USDC_SP_ADDRESS), abi=ERC20_ABI)
-    allow = int(c.functions.allowance(acct, to_checksum_address(SPOUT_SPENDER)).call())
-    need  = to_units(need_amt, dec)
-    if allow >= need: return
-    want  = to_units(APPROVE_AMOUNT_USDC, dec)
-    tx = c.functions.approve(to_checksum_address(SPOUT_SPENDER), int(want)).build_transaction({**build_tx_common(w3, acct), "gas": 100_000})
-    ok, _ = sign_send_wait(w3, tx, pk, "approve (Spout)", 100_000)
-    if not ok: raise RuntimeError("Approve gagal")
-
 def spout_transfer_once(w3: Web3, acct: str, dec: int, amt: Decimal, pk: str):
-    c = w3.eth.contract(address=to_checksum_address(USDC_SP_ADDRESS), abi=ERC20_ABI)
     units = to_units(amt, dec)
-    ensure_allow_spout(w3, acct, dec, amt, pk)
-    tx = c.functions.transfer(to_checksum_address(SPOUT_SPENDER), int(units)).build_transaction({**build_tx_common(w3, acct), "gas": 150_000})
-    ok, hx = sign_send_wait(w3, tx, pk, f"transfer {amt} USDC", 150_000)
+    ok, hx = approve_then_send(w3, acct, pk, [(USDC_SP_ADDRESS, SPOUT_SPENDER, units, 100_000, to_units(APPROVE_AMOUNT_USDC, dec), "approve (Spout)")],
+                               lambda: contract_tx(w3, acct, USDC_SP_ADDRESS, ERC20["transfer"].encode(to_checksum_address(SPOUT_SPENDER), int(units)), 150_000), f"transfer {amt} USDC", 150_000)
     if not ok: raise RuntimeError("Transfer gagal")
     console.print(f"[ok]Transfer • {tx_link(hx)}[/ok]")
 
-def run_program_6(pk: str, proxy: Optional[str], cfg: Dict[str,Any]):
+def program_6(rec: AccountRec, cfg: Dict[str,Any]):
     console.print(Rule(style="accent")); console.print("[title]Program 6 — Spout (USDC Transfer)[/title]", justify="center"); console.print(Rule(style="accent"))
-    w3 = make_provider(RPC_URL, proxy); acct = Account.from_key(pk).address
+    w3 = make_provider(RPC_URL, rec.proxy); acct, pk = rec.address, rec.key
     dec = get_decimals(w3, USDC_SP_ADDRESS)
     runs=int(cfg.get("runs",5)); delay=int(cfg.get("delay",60)); amount=Decimal(str(cfg.get("amount","0.1")))
+    runs = PREFLIGHT.cap(acct, "p6", runs, "Transfer")
     for i in range(1, runs+1):
+        if not step_todo(f"transfer:{i}"):
+            continue
         console.print(Panel.fit(f"Transfer {i}/{runs} • {amount} USDC", style="accent"))
-        try: spout_transfer_once(w3, acct, dec, amount, pk)
+        try: spout_transfer_once(w3, acct, dec, amount, pk); step_done()
         except Exception as e: console.print(f"[err]Transfer gagal: {e}[/err]")
-        if i < runs: sleep_countdown(delay, "Jeda transfer")
+        if i < runs: yield delay, "Jeda transfer"
     console.print("[ok]Program 6 selesai.[/ok]")
 
+def run_steps(steps) -> Any:
+    try:
+        while True:
+            seconds, label = next(steps)
+            sleep_countdown(seconds, label)
+    except StopIteration as e:
+        return e.value
+
+def run_program_1(rec: AccountRec, cfg: Dict[str,Any]): return run_steps(program_1(rec, cfg))
+def run_program_2(rec: AccountRec, cfg: Dict[str,Any]): return run_steps(program_2(rec, cfg))
+def run_program_3(rec: AccountRec, cfg: Dict[str,Any]): return run_steps(program_3(rec, cfg))
+def run_program_4(rec: AccountRec, cfg: Dict[str,Any]): return run_steps(program_4(rec, cfg))
+def run_program_5(rec: AccountRec, cfg: Dict[str,Any]): return run_steps(program_5(rec, cfg))
+def run_program_6(rec: AccountRec, cfg: Dict[str,Any]): return run_steps(program_6(rec, cfg))
+
 def set_default_config(cfg: Dict[str,Any]) -> Dict[str,Any]:
     while True:
         console.print(Rule(style="accent")); console.print("[title]Set Default Config[/title]", justify="center"); console.print(Rule(style="accent"))
@@ -685,7 +2425,10 @@ def set_default_config(cfg: Dict[str,Any]) -> Dict[str,Any]:
         ch = console.input("[accent]Pilih[/accent]: ").strip()
         if ch == "1":
             cur=cfg["global"]; h=ask_int("All-in-one repeat (jam)", cur.get("aio_sleep_hours",24), 1, 240)
-            cfg["global"]["aio_sleep_hours"]=h; save_config(cfg); console.print("[ok]Global tersimpan.[/ok]")
+            cfg["global"]["aio_sleep_hours"]=h
+            cfg["global"]["workers"]=ask_int("Akun paralel (worker)", int(cur.get("workers",4)), 1, 512)
+            cfg["global"]["max_rps"]=ask_int("Batas RPC per detik (0 = tanpa batas)", int(cur.get("max_rps",20)), 0, 10000)
+            save_config(cfg); console.print("[ok]Global tersimpan.[/ok]")
         elif ch == "2":
             cur=cfg["programs"]["p1"]
             yn=console.input(f"[accent]?[/accent] Aktifkan faucet? (y/n) [{'y' if cur.get('enable_faucet',True) else 'n'}]: ").strip().lower() or ('y' if cur.get('enable_faucet',True) else 'n')
@@ -749,18 +2492,18 @@ def set_default_config(cfg: Dict[str,Any]) -> Dict[str,Any]:
             console.print("[warn]Pilihan tak dikenal.[/warn]")
     return cfg
 
-def pick_account(wallets: List[Dict[str,str]]) -> Optional[int]:
+def pick_account(wallets: List[AccountRec]) -> Optional[int]:
     if not wallets: return None
     if len(wallets)==1: return 0
     console.print(Rule(style="accent")); console.print("[title]Pilih Akun[/title]", justify="center"); console.print(Rule(style="accent"))
     for i,w in enumerate(wallets, start=1):
-        console.print(f"[accent]{i}[/accent]) {w['address']}")
+        console.print(f"[accent]{i}[/accent]) {w.address}" + (f" [muted]{w.label}[/muted]" if w.label and not w.label.startswith("#") else ""))
     console.print(f"[accent]{len(wallets)+1}[/accent]) Semua akun (urut)")
     ch = ask_int("Pilih", 1, 1, len(wallets)+1)
     if ch==len(wallets)+1: return -1
     return ch-1
 
-def run_individual(cfg: Dict[str,Any], wallets: List[Dict[str,str]], proxies: List[Optional[str]]):
+def run_individual(cfg: Dict[str,Any], wallets: List[AccountRec]):
     idx = pick_account(wallets)
     if idx is None:
         console.print("[err]Tidak ada akun. Set PRIVATE_KEY di .env atau wallets.json[/err]")
@@ -777,62 +2520,289 @@ def run_individual(cfg: Dict[str,Any], wallets: List[Dict[str,str]], proxies: Li
     ch = ask_int("Pilih", 1, 1, 7)
     if ch==7: return
     for i in indices:
-        pk=normalize_pk(wallets[i]["private_key"]); proxy=proxies[i]
+        rec=wallets[i]
         try:
-            if ch==1: run_program_1(pk, proxy, cfg["programs"]["p1"])
-            elif ch==2: run_program_2(pk, proxy, cfg["programs"]["p2"])
-            elif ch==3: run_program_3(pk, proxy, cfg["programs"]["p3"])
-            elif ch==4: run_program_4(pk, proxy, cfg["programs"]["p4"])
-            elif ch==5: run_program_5(pk, proxy, cfg["programs"]["p5"])
-            elif ch==6: run_program_6(pk, proxy, cfg["programs"]["p6"])
-        except KeyboardInterrupt:
+            if ch==1: run_program_1(rec, cfg["programs"]["p1"])
+            elif ch==2: run_program_2(rec, cfg["programs"]["p2"])
+            elif ch==3: run_program_3(rec, cfg["programs"]["p3"])
+            elif ch==4: run_program_4(rec, cfg["programs"]["p4"])
+            elif ch==5: run_program_5(rec, cfg["programs"]["p5"])
+            elif ch==6: run_program_6(rec, cfg["programs"]["p6"])
+        except (KeyboardInterrupt, RunStopped):
             console.print("\n[warn]Dihentikan oleh user.[/warn]"); break
         except Exception as e:
             console.print(f"[err]Error akun {i+1}: {e}[/err]")
 
-def all_in_one(cfg: Dict[str,Any], wallets: List[Dict[str,str]], proxies: List[Optional[str]]):
+def cycle_allowance_keys(owners: List[str], cfg: Dict[str,Any], programs) -> List[AllowanceKey]:
+    keys = {p[1] for p in programs}; c = cfg["programs"]
+    pairs = []
+    if "p1" in keys and int(c["p1"].get("repeat",5)) > 0: pairs += [(a, POOL_ADDRESS) for _, a in p1_assets()]
+    if "p3" in keys and int(c["p3"].get("swap_times",5)) > 0: pairs += [(R2USDC_ADDRESS, ROUTER_ADDRESS), (R2USD_ADDRESS, ROUTER_ADDRESS)]
+    if "p3" in keys and bool(c["p3"].get("do_stake",True)): pairs.append((R2USD_ADDRESS, STAKING_CONTRACT))
+    if "p4" in keys and int(c["p4"].get("runs",5)) > 0: pairs += [(BROKEX_USDT_ADDRESS, BROKEX_POOL_ROUTER_ADDRESS), (BROKEX_USDT_ADDRESS, BROKEX_TRADE_ROUTER_ADDRESS)]
+    if "p5" in keys and int(c["p5"].get("runs",5)) > 0: pairs.append((TOKEN_ADDRESS_P5, DEPOSIT_CONTRACT_P5))
+    if "p6" in keys and int(c["p6"].get("runs",5)) > 0: pairs.append((USDC_SP_ADDRESS, SPOUT_SPENDER))
+    return [(o, t, sp) for o in owners for t, sp in pairs]
+
+def prefetch_cycle_views(wallets: List[AccountRec], cfg: Dict[str,Any], programs):
+    try:
+        keys = cycle_allowance_keys([w.address for w in wallets], cfg, programs)
+        if not keys:
+            return
+        w3 = make_provider(RPC_URL, None)
+        t0 = time.time(); n = ALLOWANCES.refresh(w3, keys)
+        console.print(f"[muted]Pre-read allowance {n}/{len(keys)} • {time.time()-t0:.1f}s[/muted]")
+    except Exception as e:
+        console.print(f"[warn]Pre-read gagal: {e}[/warn]")
+
+class Preflight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.plans: Dict[str,Dict[str,Any]] = {}
+
+    def clear(self):
+        with self.lock:
+            self.plans = {}
+
+    def plan(self, acct: str) -> Dict[str,Any]:
+        with self.lock:
+            return self.plans.get(acct.lower(), {})
+
+    def limit(self, acct: str, key: str, n: int) -> int:
+        cap = self.plan(acct).get(key)
+        return n if cap is None else max(0, min(n, cap))
+
+    def cap(self, acct: str, key: str, n: int, what: str) -> int:
+        m = self.limit(acct, key, n)
+        if m < n: console.print(f"[warn]{what} dikurangi {n}→{m} (saldo tidak cukup, pre-flight)[/warn]")
+        return m
+
+    @staticmethod
+    def tokens(cfg: Dict[str,Any], keys: set) -> List[str]:
+        out = []
+        if "p1" in keys: out += [a for _, a in p1_assets()]
+        if "p3" in keys: out += [R2USDC_ADDRESS, R2USD_ADDRESS]
+        if "p4" in keys: out.append(BROKEX_USDT_ADDRESS)
+        if "p5" in keys: out.append(TOKEN_ADDRESS_P5)
+        if "p6" in keys: out.append(USDC_SP_ADDRESS)
+        return list(dict.fromkeys(t.lower() for t in out))
+
+    def budget(self, w3: Web3, cfg: Dict[str,Any], keys: set, bal: Dict[str,int]) -> Dict[str,Any]:
+        units = lambda token, amount: max(1, to_units(amount, get_decimals(w3, token)))
+        bal = dict(bal); plan: Dict[str,Any] = {}
+        def take(token: str, per: int, want: int) -> int:
+            n = max(0, min(want, bal[token.lower()] // per)); bal[token.lower()] -= n * per
+            return n
+        if "p1" in keys:
+            c = cfg["programs"]["p1"]; faucet = c.get("enable_faucet", True); repeat = int(c.get("repeat",5))
+            per = Decimal(str(c.get("fixed","0.05") if c.get("amount_mode","range") == "fixed" else c.get("max","0.09")))
+            plan["p1"] = {}
+            for label, token in p1_assets():
+                if faucet and label in ("GOLD","TSLA","NVIDIA"): bal[token.lower()] += to_units(FAUCET_AMOUNT, 18)
+                plan["p1"][token.lower()] = take(token, units(token, per), repeat)
+        if "p3" in keys:
+            c = cfg["programs"]["p3"]; n = int(c.get("swap_times",5))
+            amt = Decimal(str(c.get("swap_amount","0.1"))).quantize(Decimal("0.000001"))
+            usdc = bal[R2USDC_ADDRESS.lower()] >= units(R2USDC_ADDRESS, amt); r2 = bal[R2USD_ADDRESS.lower()] >= units(R2USD_ADDRESS, amt)
+            if not usdc and not r2: plan["p3_swaps"] = 0
+            elif usdc != r2: plan["p3_dir"] = 1 if usdc else 2
+            if n % 2 and "p3_swaps" not in plan:
+                bal[R2USD_ADDRESS.lower()] += units(R2USD_ADDRESS, amt) * (1 if plan.get("p3_dir") == 1 else -1)
+            if bool(c.get("do_stake", True)):
+                stake = units(R2USD_ADDRESS, Decimal(str(c.get("stake_amount","0.1"))).quantize(Decimal("0.000001")))
+                want = int(c.get("stake_times",1)) if c.get("stake_mode","random") != "random" else int(c.get("stake_rand_max",5))
+                plan["p3_stakes"] = take(R2USD_ADDRESS, stake, want)
+        if "p4" in keys: plan["p4"] = take(BROKEX_USDT_ADDRESS, units(BROKEX_USDT_ADDRESS, Decimal(20)), int(cfg["programs"]["p4"].get("runs",5)))
+        if "p5" in keys: plan["p5"] = take(TOKEN_ADDRESS_P5, units(TOKEN_ADDRESS_P5, DEPOSIT_AMOUNT_P5), int(cfg["programs"]["p5"].get("runs",5)))
+        if "p6" in keys: plan["p6"] = take(USDC_SP_ADDRESS, units(USDC_SP_ADDRESS, Decimal(str(cfg["programs"]["p6"].get("amount","0.1")))), int(cfg["programs"]["p6"].get("runs",5)))
+        return plan
+
+    def scan(self, w3: Web3, wallets: List[AccountRec], cfg: Dict[str,Any], programs) -> Dict[str,Dict[str,Any]]:
+        keys = {p[1] for p in programs}
+        tokens = self.tokens(cfg, keys)
+        t0 = time.time()
+        owners = [w.address for w in wallets]
+        native: List[Any] = []
+        for i in range(0, len(owners), MULTICALL_CHUNK):
+            native += rpc_batch(w3, [("eth_getBalance", [a, "latest"]) for a in owners[i:i+MULTICALL_CHUNK]])
+        res = MULTICALL.call(w3, [(t, "balanceOf", (to_checksum_address(a),)) for a in owners for t in tokens])
+        fees = suggest_fees(w3); one_tx = PREFLIGHT_GAS_PER_TX * int(fees.get("maxFeePerGas", fees.get("gasPrice", 0)))
+        plans: Dict[str,Dict[str,Any]] = {}; skipped = shrunk = 0
+        for i, a in enumerate(owners):
+            row = res[i*len(tokens):(i+1)*len(tokens)]
+            if isinstance(native[i], Exception) or any(isinstance(r, Exception) for r in row):
+                continue
+            if int(native[i], 16) < one_tx:
+                plans[a.lower()] = {"skip": f"saldo native {Web3.from_wei(int(native[i], 16), 'ether')} < biaya 1 tx"}; skipped += 1
+                continue
+            plan = self.budget(w3, cfg, keys, {t: int(r) for t, r in zip(tokens, row)})
+            plans[a.lower()] = plan
+            if self.shrinks(cfg, plan): shrunk += 1
+        with self.lock:
+            self.plans = plans
+        console.print(f"[muted]Pre-flight saldo {len(plans)}/{len(owners)} akun • {skipped} dilewati • {shrunk} dikurangi • {time.time()-t0:.1f}s[/muted]")
+        return plans
+
+    @staticmethod
+    def shrinks(cfg: Dict[str,Any], plan: Dict[str,Any]) -> bool:
+        p = cfg["programs"]
+        want = {"p4": int(p["p4"].get("runs",5)), "p5": int(p["p5"].get("runs",5)), "p6": int(p["p6"].get("runs",5)), "p3_swaps": int(p["p3"].get("swap_times",5))}
+        return any(k in plan and plan[k] < n for k, n in want.items()) or any(v == 0 for v in plan.get("p1", {}).values())
+
+PREFLIGHT = Preflight()
+
+PROGRAMS = [("P1", "p1", program_1), ("P2", "p2", program_2), ("P3", "p3", program_3),
+            ("P4", "p4", program_4), ("P5", "p5", program_5), ("P6", "p6", program_6)]
+
+def account_steps(i: int, n: int, w: AccountRec, cfg: Dict[str,Any], programs=PROGRAMS):
+    ctx = RUN_CTX.get(); started = time.time()
+    console.print(Panel.fit(f"Akun {i}/{n} • {w.address}", border_style="accent"))
+    skip = PREFLIGHT.plan(w.address).get("skip")
+    if skip:
+        console.print(f"[warn]Akun {i} dilewati: {skip}[/warn]"); return
+    for name, key, prog in programs:
+        if ctx is not None:
+            if JOURNAL.done(ctx["acct"], name):
+                console.print(f"[muted]{name} akun {i}: sudah selesai (journal), dilewati[/muted]"); continue
+            ctx["prog"] = name; ctx["step"] = None
+        t0 = time.time(); ok = False
+        try: yield from prog(w, cfg["programs"][key]); ok = True
+        except Exception as e: console.print(f"[err]{name} error: {e}[/err]")
+        METRICS.observe("program_seconds", time.time() - t0, program=name)
+        if ctx is not None and ok:
+            JOURNAL.write(ev="prog", cycle=ctx["cycle"], acct=ctx["acct"], prog=name)
+    METRICS.observe("account_duration_seconds", time.time() - started)
+
+class Scheduler:
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self.cond = threading.Condition()
+        self.timers: List[Tuple[float,int,Any,contextvars.Context]] = []
+        self.seq = itertools.count()
+        self.active = 0
+
+    def add(self, steps, delay: float = 0, ctx: Optional[contextvars.Context] = None):
+        with self.cond:
+            heapq.heappush(self.timers, (time.monotonic() + max(0.0, delay), next(self.seq), steps, ctx or contextvars.copy_context()))
+            self.cond.notify_all()
+
+    def step(self, steps, ctx: contextvars.Context):
+        run = ctx.get(RUN_CTX) or {}; t0 = time.perf_counter()
+        try:
+            seconds, label = ctx.run(next, steps)
+            METRICS.inc("delay_scheduled_seconds_total", seconds, label=label)
+            self.add(steps, seconds, ctx)
+        except StopIteration:
+            pass
+        except RunStopped:
+            pass
+        except Exception as e:
+            console.print(f"[err]Error langkah: {e}[/err]")
+        finally:
+            METRICS.inc("program_busy_seconds_total", time.perf_counter() - t0, program=run.get("prog") or "-")
+            with self.cond:
+                self.active -= 1; self.cond.notify_all()
+
+    def run(self):
+        ex = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="akun")
+        try:
+            while True:
+                with self.cond:
+                    while True:
+                        if not self.timers and self.active == 0:
+                            return
+                        now = time.monotonic()
+                        paused = BREAKER.remaining()
+                        if self.timers and self.active < self.workers and self.timers[0][0] <= now and not paused:
+                            break
+                        wait = paused or (self.timers[0][0] - now if self.timers and self.active < self.workers else 1.0)
+                        self.cond.wait(min(max(wait, 0.0), 1.0))
+                    _, _, steps, ctx = heapq.heappop(self.timers); self.active += 1
+                ex.submit(self.step, steps, ctx)
+        except BaseException:
+            STOP.set()
+            with self.cond:
+                pending = [t[2] for t in self.timers]; self.timers.clear()
+            for steps in pending: steps.close()
+            TRACKER.stop()
+            ex.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            ex.shutdown(wait=not STOP.is_set())
+
+def cycle_scope(wallets: List[AccountRec], programs) -> str:
+    return keccak(text=",".join(p[1] for p in programs) + "|" + ",".join(sorted(w.address.lower() for w in wallets)))[:8].hex()
+
+def run_cycle(cfg: Dict[str,Any], wallets: List[AccountRec], programs=PROGRAMS):
+    workers = min(max(1, int(cfg["global"].get("workers",4))), len(wallets))
+    RPC_LIMITER.set_rate(float(cfg["global"].get("max_rps",20)))
+    prefetch_cycle_views(wallets, cfg, programs)
+    if PREFLIGHT_ENABLED:
+        try: PREFLIGHT.scan(make_provider(RPC_URL, None), wallets, cfg, programs)
+        except Exception as e: console.print(f"[warn]Pre-flight gagal: {e}[/warn]")
+    console.print(f"[muted]{len(wallets)} akun • {workers} worker[/muted]")
+    STOP.clear(); t0 = time.time()
+    cycle = JOURNAL.begin_cycle(cycle_scope(wallets, programs))
+    sched = Scheduler(workers)
+    for i,w in enumerate(wallets, start=1):
+        ctx = contextvars.Context()
+        ctx.run(RUN_CTX.set, {"cycle": cycle, "acct": w.address.lower(), "prog": None, "step": None})
+        sched.add(account_steps(i, len(wallets), w, cfg, programs), 0, ctx)
+    try:
+        sched.run()
+    finally:
+        PREFLIGHT.clear(); LOG.drain(); JOURNAL.flush()
+        METRICS.set("cycle_seconds", time.time() - t0); METRICS.export()
+    JOURNAL.end_cycle()
+
+def all_in_one(cfg: Dict[str,Any], wallets: List[AccountRec], programs=PROGRAMS, once=False) -> Optional[bool]:
     if not wallets:
         console.print("[err]Tidak ada akun. Set PRIVATE_KEY di .env atau wallets.json[/err]")
-        return
+        return False
+    names = "→".join(p[0] for p in programs)
     console.print(Rule(style="accent")); console.print("[title]All in One Run[/title]", justify="center"); console.print(Rule(style="accent"))
-    console.print("[muted]Mode ini akan menjalankan P1→P6 lalu mengulang setiap 24 jam. Tekan Ctrl+C untuk berhenti.[/muted]")
+    if once: console.print(f"[muted]Mode ini akan menjalankan {names} satu kali untuk {len(wallets)} akun.[/muted]")
+    else: console.print(f"[muted]Mode ini akan menjalankan {names} lalu mengulang setiap 24 jam. Tekan Ctrl+C untuk berhenti.[/muted]")
+    try:
+        JOURNAL.load()
+        n = JOURNAL.reconcile(make_provider(RPC_URL, None))
+        if n: console.print(f"[muted]Journal: {n} tx tertunda dicek ulang ke chain[/muted]")
+        hours = int(cfg["global"].get("aio_sleep_hours",24))
+        left = (JOURNAL.ended_at or 0) + hours*3600 - time.time()
+        if not once and not JOURNAL.open and left > 0 and JOURNAL.scope == cycle_scope(wallets, programs):
+            console.print(Panel.fit(f"Siklus {JOURNAL.cycle} sudah selesai. Lanjut tidur {left/3600:.1f} jam…", border_style="accent"))
+            sleep_countdown(int(left), "Sisa tidur")
+    except KeyboardInterrupt:
+        console.print("\n[warn]Dihentikan oleh user.[/warn]"); return None
+    except Exception as e:
+        console.print(f"[warn]Journal tidak bisa dipulihkan: {e}[/warn]")
     while True:
         try:
-            for i,w in enumerate(wallets, start=1):
-                pk=normalize_pk(w["private_key"]); proxy=proxies[i-1]
-                console.print(Panel.fit(f"Akun {i}/{len(wallets)} • {w['address']}", border_style="accent"))
-                try: run_program_1(pk, proxy, cfg["programs"]["p1"])
-                except Exception as e: console.print(f"[err]P1 error: {e}[/err]")
-                try: run_program_2(pk, proxy, cfg["programs"]["p2"])
-                except Exception as e: console.print(f"[err]P2 error: {e}[/err]")
-                try: run_program_3(pk, proxy, cfg["programs"]["p3"])
-                except Exception as e: console.print(f"[err]P3 error: {e}[/err]")
-                try: run_program_4(pk, proxy, cfg["programs"]["p4"])
-                except Exception as e: console.print(f"[err]P4 error: {e}[/err]")
-                try: run_program_5(pk, proxy, cfg["programs"]["p5"])
-                except Exception as e: console.print(f"[err]P5 error: {e}[/err]")
-                try: run_program_6(pk, proxy, cfg["programs"]["p6"])
-                except Exception as e: console.print(f"[err]P6 error: {e}[/err]")
+            run_cycle(cfg, wallets, programs)
+            if once:
+                console.print(Panel.fit("Selesai semua program untuk semua akun.", border_style="accent")); return True
             hours = int(cfg["global"].get("aio_sleep_hours",24))
             console.print(Panel.fit(f"Selesai semua program untuk semua akun. Tidur {hours} jam…", border_style="accent"))
             sleep_countdown(hours*3600, f"Tidur {hours} jam")
         except KeyboardInterrupt:
-            console.print("\n[warn]Dihentikan oleh user.[/warn]"); break
+            console.print("\n[warn]Dihentikan oleh user.[/warn]"); return None
         except Exception as e:
-            console.print(f"[err]Error siklus: {e}[/err]"); sleep_countdown(60, "Tunggu 60s & lanjut")
+            console.print(f"[err]Error siklus: {e}[/err]")
+            if once: return False
+            sleep_countdown(60, "Tunggu 60s & lanjut")
 
 def main_menu():
     cfg = load_config()
-    wallets = parse_wallets()
-    proxies = parse_proxies_simple(wallets)
+    warm_token_meta()
+    wallets = load_accounts()
     while True:
         console.print(Rule(style="accent")); console.print("[title]Pharos — Unified Runner[/title]", justify="center"); console.print(Rule(style="accent"))
         t=Table(box=box.ROUNDED, show_header=True, header_style="accent"); t.add_column("No"); t.add_column("Menu", style="title")
         t.add_row("1","All in One Run (loop 24 jam)"); t.add_row("2","Set Default Config"); t.add_row("3","Individual Run"); t.add_row("4","Keluar"); console.print(t)
         ch = console.input("[accent]Pilih[/accent]: ").strip()
-        if ch=="1": all_in_one(cfg, wallets, proxies)
+        if ch=="1": all_in_one(cfg, wallets)
         elif ch=="2": cfg=set_default_config(cfg); save_config(cfg)
-        elif ch=="3": run_individual(cfg, wallets, proxies)
+        elif ch=="3": run_individual(cfg, wallets)
         elif ch=="4": console.print("[muted]Bye.[/muted]"); break
         else: console.print("[warn]Pilihan tak dikenal.[/warn]")
 
@@ -0,0 +1,113 @@
+import json, socket, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import main
+
+RECEIPT = {"transactionHash": "0x" + "11"*32, "status": "0x1", "blockNumber": "0x10"}
+
+class StubNode:
+    def __init__(self, delay: float = 0.0, results=None):
+        self.delay = delay
+        self.results = {"eth_blockNumber": "0x10", **(results or {})}
+        self.calls = []
+        node = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            def log_message(self, *a): pass
+            def do_POST(self):
+                req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.calls.append(req["method"])
+                time.sleep(node.delay)
+                body = json.dumps({"jsonrpc": "2.0", "id": req["id"], "result": node.results.get(req["method"])}).encode()
+                self.send_response(200); self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown(); self.server.server_close()
+
+def down_url() -> str:
+    s = socket.socket(); s.bind(("127.0.0.1", 0)); port = s.getsockname()[1]; s.close()
+    return f"http://127.0.0.1:{port}"
+
+def rpc(method: str):
+    body = json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": []})
+    return lambda url: main.post_rpc(url, body, {"timeout": 5})
+
+@pytest.fixture
+def nodes(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "RPC_HEDGE_MIN_MS", 100.0)
+    made = []
+    def make(**kw):
+        n = StubNode(**kw); made.append(n); return n
+    yield make
+    for n in made: n.close()
+
+def test_order_puts_down_and_lagging_endpoints_last(nodes):
+    fast, slow, dead = nodes(), nodes(delay=0.05), down_url()
+    pool = main.EndpointPool([dead, slow.url, fast.url])
+    pool.thread = threading.main_thread()
+    pool.probe()
+    assert pool.order(dead) == [fast.url, slow.url, dead]
+    with pool.lock:
+        pool.heads[slow.url] += main.RPC_MAX_LAG_BLOCKS + 1
+    assert pool.order(dead) == [slow.url, fast.url, dead]
+
+def test_guarded_rotates_past_a_down_endpoint(nodes):
+    live = nodes(results={"eth_chainId": "0x1"})
+    out = main.rpc_guarded("eth_chainId", rpc("eth_chainId"), [down_url(), live.url])
+    assert out["result"] == "0x1" and live.calls == ["eth_chainId"]
+
+def test_hedged_read_uses_the_faster_endpoint(nodes):
+    slow, fast = nodes(delay=1.0, results={"eth_call": "0xaa"}), nodes(results={"eth_call": "0xbb"})
+    pool = main.EndpointPool([slow.url, fast.url])
+    t0 = time.perf_counter()
+    out = pool.hedged(rpc("eth_call"), slow.url, [slow.url, fast.url])
+    assert out["result"] == "0xbb" and time.perf_counter() - t0 < 0.8
+    assert fast.calls == ["eth_call"]
+
+def test_hedged_read_is_not_sent_twice_when_primary_is_fast(nodes):
+    a, b = nodes(results={"eth_call": "0xaa"}), nodes(results={"eth_call": "0xbb"})
+    pool = main.EndpointPool([a.url, b.url])
+    assert pool.hedged(rpc("eth_call"), a.url, [a.url, b.url])["result"] == "0xaa"
+    assert b.calls == []
+
+def test_hedged_receipt_null_from_lagging_endpoint_is_not_final(nodes):
+    primary = nodes(delay=0.4, results={"eth_getTransactionReceipt": RECEIPT})
+    lagging = nodes(results={"eth_getTransactionReceipt": None})
+    pool = main.EndpointPool([primary.url, lagging.url])
+    out = pool.hedged(rpc("eth_getTransactionReceipt"), primary.url, [primary.url, lagging.url])
+    assert out["result"] == RECEIPT and lagging.calls == ["eth_getTransactionReceipt"]
+
+def test_hedged_receipt_null_is_returned_when_nobody_has_it(nodes):
+    a, b = nodes(delay=0.3), nodes()
+    pool = main.EndpointPool([a.url, b.url])
+    assert pool.hedged(rpc("eth_getTransactionReceipt"), a.url, [a.url, b.url])["result"] is None
+
+def test_hedged_read_survives_a_down_alternate(nodes):
+    slow = nodes(delay=0.3, results={"eth_call": "0xaa"})
+    dead = down_url()
+    pool = main.EndpointPool([slow.url, dead])
+    assert pool.hedged(rpc("eth_call"), slow.url, [slow.url, dead])["result"] == "0xaa"
+
+def test_broadcast_send_reaches_every_live_endpoint(nodes):
+    h = "0x" + "22"*32
+    a, b = nodes(results={"eth_sendRawTransaction": h}), nodes(delay=0.2, results={"eth_sendRawTransaction": h})
+    dead = down_url()
+    pool = main.EndpointPool([dead, a.url, b.url])
+    assert pool.broadcast(rpc("eth_sendRawTransaction"), [dead, a.url, b.url])["result"] == h
+    time.sleep(0.4)
+    assert a.calls == ["eth_sendRawTransaction"] and b.calls == ["eth_sendRawTransaction"]
+
+def test_broadcast_fails_only_when_every_endpoint_is_down(nodes):
+    pool = main.EndpointPool([down_url(), down_url()])
+    with pytest.raises(Exception):
+        pool.broadcast(rpc("eth_sendRawTransaction"), list(pool.urls))
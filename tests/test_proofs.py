@@ -0,0 +1,103 @@
+import json, sys, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import main
+
+class StubProofApi:
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.version = 1
+        self.calls = []
+        api = self
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            def log_message(self, *a): pass
+            def do_GET(self):
+                api.calls.append(self.path)
+                time.sleep(api.delay)
+                if api.failures > 0:
+                    api.failures -= 1
+                    code, body = 503, b'{"error":"busy"}'
+                else:
+                    code, body = 200, json.dumps({"proof": f"0x{api.version:02x}" + "ab"*31}).encode()
+                self.send_response(code); self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(body))); self.end_headers(); self.wfile.write(body)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/proof?pairs="
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def proof(self, version: int) -> str:
+        return f"0x{version:02x}" + "ab"*31
+
+    def close(self):
+        self.server.shutdown(); self.server.server_close()
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    made = []
+    def make(**kw):
+        a = StubProofApi(**kw); made.append(a)
+        monkeypatch.setattr(main, "BROKEX_PROOF_API", a.url)
+        return a
+    yield make
+    for a in made: a.close()
+
+def test_ttl_hit_makes_no_http_call(api):
+    stub = api()
+    cache = main.ProofCache(60)
+    cache.thread = threading.main_thread()
+    cache.proofs[0] = (stub.proof(7), time.time())
+    assert cache.get(0, None) == stub.proof(7)
+    assert stub.calls == []
+
+def test_expired_entry_is_fetched_again(api):
+    stub = api()
+    cache = main.ProofCache(1)
+    cache.thread = threading.main_thread()
+    cache.proofs[0] = (stub.proof(7), time.time() - 5)
+    assert cache.get(0, None) == stub.proof(1)
+    assert stub.calls == ["/proof?pairs=0"]
+
+def test_refresher_replaces_aging_entry_while_old_proof_is_served(api, monkeypatch):
+    monkeypatch.setattr(main, "BROKEX_PROOF_IDLE_SECS", 3)
+    stub = api(delay=0.5)
+    stub.version = 2
+    cache = main.ProofCache(4)
+    for p in main.BROKEX_PAIRS:
+        cache.proofs[p["idx"]] = (stub.proof(1), time.time() - 2.5)
+    cache.start()
+    t0 = time.perf_counter()
+    assert cache.get(0, None) == stub.proof(1)
+    assert time.perf_counter() - t0 < 0.2
+    deadline = time.time() + 3
+    while cache.fresh(0) != stub.proof(2) and time.time() < deadline:
+        time.sleep(0.05)
+    assert cache.fresh(0) == stub.proof(2)
+    assert sorted(stub.calls)[:len(main.BROKEX_PAIRS)] == sorted(f"/proof?pairs={p['idx']}" for p in main.BROKEX_PAIRS)
+
+def test_fetch_backs_off_between_stub_errors(api, monkeypatch):
+    stub = api(failures=2)
+    waits = []
+    monkeypatch.setattr(main, "backoff_delay", lambda i: waits.append(i) or 0.01)
+    cache = main.ProofCache(60)
+    assert cache.fetch(1, None) == stub.proof(1)
+    assert len(stub.calls) == 3 and waits == [1, 2]
+    assert cache.fresh(1) == stub.proof(1)
+
+def test_fetch_gives_up_after_retries(api, monkeypatch):
+    stub = api(failures=10)
+    monkeypatch.setattr(main, "backoff_delay", lambda i: 0.01)
+    with pytest.raises(RuntimeError, match="fetch_proof gagal"):
+        main.ProofCache(60).fetch(2, None, retries=3)
+    assert len(stub.calls) == 3
+
+def test_backoff_delay_is_capped_exponential():
+    for attempt in range(1, 10):
+        assert 0 <= main.backoff_delay(attempt, 1.0, 8.0) <= min(8.0, 2 ** (attempt - 1))